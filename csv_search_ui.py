@@ -2,63 +2,776 @@
 # Description: Tkinter app to search and display the Packsize CSV.
 import tkinter as tk
 from tkinter import filedialog, ttk
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+import codecs
 import csv
+import io
+import json
+import mmap
+import os
+import queue
+import re
+import threading
+import numpy as np
 
+# Length of the n-grams used for substring lookups
+NGRAM_SIZE = 3
 
-def load_csv(file_path, treeview):
-    global all_data  # Store all data for filtering
-    all_data = []
+# Rows materialized below the visible window of the table
+VIEW_BUFFER_ROWS = 5
+# Rows moved per mouse wheel notch
+WHEEL_SCROLL_ROWS = 3
 
+# Sidecar file holding the row offset index of a CSV
+INDEX_SUFFIX = ".idx"
+# Bumped when the row boundaries change, so sidecars written by an older scan are rebuilt
+INDEX_MAGIC = b"CSVIDX2\n"
+
+# Rows parsed between progress updates while a file loads
+LOAD_BATCH_ROWS = 20000
+# How often the UI drains messages from worker threads, and how many per drain
+POLL_INTERVAL_MS = 50
+MAX_MESSAGES_PER_POLL = 20
+# Idle time after the last keystroke before search-as-you-type runs
+SEARCH_DEBOUNCE_MS = 250
+
+SEARCH_MODES = {
+    "Contains": "substring",
+    "Starts with": "prefix",
+    "Exact": "exact",
+    "Query": "query",
+}
+
+QUERY_TOKEN_PATTERN = re.compile(
+    r'\s*(?:(?P<op><=|>=|!=|\^=|=|<|>|~)|(?P<paren>[()])|"(?P<quoted>[^"]*)"|\[(?P<bracketed>[^\]]*)\]'
+    r'|(?P<word>[^\s()<>=!~^"\[]+))\s*')
+NUMERIC_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+class SearchIndex:
+    """
+    In-memory search index over the rows of a loaded CSV, built once per load.
+    Columns are normalized and indexed on first use; the item number column
+    (column 0) is indexed up front by load_csv. Only the normalized values of
+    searched columns are kept, never whole rows.
+    """
+
+    def __init__(self, rows, values=None):
+        self.rows = rows
+        self._values = dict(values or {})   # column -> normalized (stripped, lowercased) values
+        self._prefix = {}   # column -> (sorted normalized values, matching row ids)
+        self._ngrams = {}   # column -> {n-gram: array of row ids}
+        # Indexes are built lazily from worker threads; concurrent callers of the same build wait for it
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def _cached(self, cache, column, build):
+        if column in cache:
+            return cache[column]
+        with self._lock:
+            build_lock = self._build_locks.setdefault((id(cache), column), threading.Lock())
+        with build_lock:
+            if column not in cache:
+                cache[column] = build(column)
+        return cache[column]
+
+    def values(self, column):
+        return self._cached(self._values, column, self._build_values)
+
+    def _build_values(self, column):
+        values = [value.strip().lower() for value in self.rows.column(column)]
+        # Row ids index both the values and the rows; a mismatch would show the wrong row for a hit
+        if len(values) != len(self.rows):
+            raise ValueError(f"Column {column} has {len(values)} values for {len(self.rows)} rows")
+        return values
+
+    def prefix_index(self, column):
+        return self._cached(self._prefix, column, self._build_prefix_index)
+
+    def ngram_index(self, column):
+        return self._cached(self._ngrams, column, self._build_ngram_index)
+
+    def _build_prefix_index(self, column):
+        values = self.values(column)
+        order = sorted(range(len(values)), key=values.__getitem__)
+        return [values[i] for i in order], array("I", order)
+
+    def _build_ngram_index(self, column):
+        postings = defaultdict(lambda: array("I"))
+        for row_id, value in enumerate(self.values(column)):
+            for gram in {value[i:i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}:
+                postings[gram].append(row_id)
+        return dict(postings)
+
+    def build(self, column):
+        """Index a column ahead of its first search."""
+        self.prefix_index(column)
+        self.ngram_index(column)
+
+    def exact(self, column, query):
+        keys, row_ids = self.prefix_index(column)
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end] == query:
+            end += 1
+        return sorted(row_ids[start:end])
+
+    def prefix(self, column, query):
+        keys, row_ids = self.prefix_index(column)
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + chr(0x10FFFF), lo=start)
+        return sorted(row_ids[start:end])
+
+    def substring(self, column, query):
+        values = self.values(column)
+        if len(query) < NGRAM_SIZE:
+            # Too short for the n-gram index; the pre-normalized values still avoid re-lowercasing
+            return [row_id for row_id, value in enumerate(values) if query in value]
+
+        postings = self.ngram_index(column)
+        grams = {query[i:i + NGRAM_SIZE] for i in range(len(query) - NGRAM_SIZE + 1)}
+        lists = sorted((postings.get(gram, ()) for gram in grams), key=len)
+        if not lists[0]:
+            return []
+        # Intersect starting from the rarest n-gram, then confirm the full match
+        candidates = set(lists[0])
+        for row_ids in lists[1:]:
+            candidates.intersection_update(row_ids)
+            if not candidates:
+                return []
+        return sorted(row_id for row_id in candidates if query in values[row_id])
+
+    def narrow(self, row_ids, query, column=0, mode="substring"):
+        """
+        Filter an earlier result down to the rows matching a longer query. Only
+        valid when the earlier query is a prefix of this one in the same column
+        and mode, and mode is "substring" or "prefix".
+        """
+        query = query.strip().lower()
+        values = self.values(column)
+        if mode == "prefix":
+            return [row_id for row_id in row_ids if values[row_id].startswith(query)]
+        return [row_id for row_id in row_ids if query in values[row_id]]
+
+    def search(self, query, column=0, mode="substring"):
+        """Return the ids (positions in rows) of the rows matching query, in file order."""
+        query = query.strip().lower()
+        if not query:
+            return range(len(self.rows))
+        return getattr(self, mode)(column, query)
+
+
+class QueryError(ValueError):
+    """Raised for a column query that cannot be parsed or refers to an unknown column."""
+
+
+class ColumnQuery:
+    """
+    Multi-column queries evaluated as NumPy masks over whole columns, e.g.
+
+        Length >= 10 AND Width < 20.5 OR "Item Number" ^= ps-001
+
+    Operators: = and != (equals), ^= (starts with), ~ (contains) compare the
+    normalized text; <, <=, >, >= compare numbers. AND binds tighter than OR;
+    parentheses group. Column names with spaces go in "quotes" or [brackets].
+    Columns are encoded on first use as category codes over their distinct
+    values: string predicates and sort ranks are computed once per distinct
+    value and broadcast to the rows through the codes.
+    """
+
+    def __init__(self, index, headers):
+        self.index = index
+        self.headers = headers
+        self._categories = {}  # column -> (int32 code per row, list of distinct normalized values)
+        self._ranks = {}  # column -> sort rank of each distinct value
+        self._numbers = {}  # column -> (float64 array with NaN for non-numbers, all values numeric?)
+
+    def categories(self, column):
+        # The distinct values are the index's own str objects, so a single long cell costs only its own size
+        # (a fixed-width unicode array would pad every row to the longest one)
+        if column not in self._categories:
+            values = self.index.values(column)
+            codes_by_value = {}
+            codes = np.fromiter((codes_by_value.setdefault(value, len(codes_by_value)) for value in values),
+                                dtype=np.int32, count=len(values))
+            # Two threads may race to build the same columns; setdefault keeps the first one
+            self._categories.setdefault(column, (codes, list(codes_by_value)))
+        return self._categories[column]
+
+    def ranks(self, column):
+        if column not in self._ranks:
+            distinct = self.categories(column)[1]
+            ranks = np.empty(len(distinct), dtype=np.int32)
+            ranks[sorted(range(len(distinct)), key=distinct.__getitem__)] = np.arange(len(distinct), dtype=np.int32)
+            self._ranks.setdefault(column, ranks)
+        return self._ranks[column]
+
+    def numbers(self, column):
+        if column not in self._numbers:
+            codes, distinct = self.categories(column)
+            # Empty cells become NaN; each distinct value is parsed once
+            parsed = np.array([_to_float(value) if value else np.nan for value in distinct], dtype=np.float64)
+            numeric = all(value == "" or not np.isnan(number) or value.lower() == "nan"
+                          for value, number in zip(distinct, parsed))
+            self._numbers.setdefault(column, (parsed[codes], numeric))
+        return self._numbers[column][0]
+
+    def is_numeric(self, column):
+        self.numbers(column)
+        return self._numbers[column][1]
+
+    def column_index(self, name):
+        lowered = name.strip().lower()
+        for position, header in enumerate(self.headers):
+            if header.strip().lower() == lowered:
+                return position
+        raise QueryError(f"Unknown column: {name}")
+
+    def run(self, text):
+        """Return the ids of the rows matching a query, in file order."""
+        tokens = _tokenize(text)
+        if not tokens:
+            return range(len(self.index.rows))
+        mask, position = self._parse_or(tokens, 0)
+        if position != len(tokens):
+            raise QueryError(f"Unexpected {tokens[position][1]!r}")
+        return np.flatnonzero(mask)
+
+    def sort(self, row_ids, column, descending=False):
+        """Return row_ids ordered by a column, numerically when every value in it is a number."""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        if self.is_numeric(column):
+            keys = self.numbers(column)[row_ids]
+            # Negating keeps NaN (empty cells) last in both directions
+            order = np.argsort(-keys if descending else keys, kind="stable")
+        else:
+            order = np.argsort(self.ranks(column)[self.categories(column)[0][row_ids]], kind="stable")
+            if descending:
+                order = order[::-1]
+        return row_ids[order]
+
+    def _parse_or(self, tokens, position):
+        mask, position = self._parse_and(tokens, position)
+        while position < len(tokens) and tokens[position] == ("word", "or"):
+            right, position = self._parse_and(tokens, position + 1)
+            mask = mask | right
+        return mask, position
+
+    def _parse_and(self, tokens, position):
+        mask, position = self._parse_predicate(tokens, position)
+        while position < len(tokens) and tokens[position] == ("word", "and"):
+            right, position = self._parse_predicate(tokens, position + 1)
+            mask = mask & right
+        return mask, position
+
+    def _parse_predicate(self, tokens, position):
+        if position >= len(tokens):
+            raise QueryError("Query ends unexpectedly")
+        if tokens[position][0] == "(":
+            mask, position = self._parse_or(tokens, position + 1)
+            if position >= len(tokens) or tokens[position][0] != ")":
+                raise QueryError("Missing closing parenthesis")
+            return mask, position + 1
+        if position + 3 > len(tokens):
+            raise QueryError("Expected: column operator value")
+        (name_kind, name), (op_kind, op), (value_kind, value) = tokens[position:position + 3]
+        if name_kind not in ("word", "text") or op_kind != "op" or value_kind not in ("word", "text"):
+            raise QueryError(f"Expected: column operator value, near {name!r}")
+        return self._predicate(self.column_index(name), op, value), position + 3
+
+    def _predicate(self, column, op, value):
+        if op in NUMERIC_OPERATORS:
+            try:
+                number = float(value)
+            except ValueError:
+                raise QueryError(f"{op} needs a number, got {value!r}")
+            # NaN (empty or non-numeric cells) never satisfies a comparison
+            return NUMERIC_OPERATORS[op](self.numbers(column), number)
+
+        codes, distinct = self.categories(column)
+        value = value.strip().lower()
+        if op in ("=", "!="):
+            selected = np.fromiter((candidate == value for candidate in distinct), dtype=bool, count=len(distinct))
+        elif op == "^=":
+            selected = np.fromiter((candidate.startswith(value) for candidate in distinct), dtype=bool,
+                                   count=len(distinct))
+        else:
+            selected = np.fromiter((value in candidate for candidate in distinct), dtype=bool, count=len(distinct))
+        mask = selected[codes]
+        return ~mask if op == "!=" else mask
+
+
+def _to_float(value):
     try:
-        with open(file_path, 'r') as csv_file:
-            reader = csv.reader(csv_file)
-            headers = next(reader)
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = QUERY_TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Cannot parse query near {text[position:]!r}")
+        position = match.end()
+        if match.group("op"):
+            tokens.append(("op", match.group("op")))
+        elif match.group("paren"):
+            tokens.append((match.group("paren"), match.group("paren")))
+        elif match.group("quoted") is not None or match.group("bracketed") is not None:
+            quoted = match.group("quoted")
+            tokens.append(("text", quoted if quoted is not None else match.group("bracketed")))
+        elif match.group("word"):
+            word = match.group("word")
+            # Keywords are case-insensitive; other words keep their text
+            tokens.append(("word", word.lower()) if word.lower() in ("and", "or") else ("word", word))
+    return tokens
+
+
+class CsvStore:
+    """
+    Read-only CSV storage over a memory map. Holds an array of row byte
+    offsets and decodes a row only when it is displayed. The offsets (and the
+    normalized values of indexed columns) are persisted in a sidecar file so
+    reopening an unchanged CSV skips the scan.
+    """
+
+    def __init__(self, file_path, encoding="utf-8"):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.index_path = file_path + INDEX_SUFFIX
+        self._file = open(file_path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self.signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+
+        start = 3 if self._map[:3] == codecs.BOM_UTF8 else 0
+        self.headers, header_end = next(self._records(start), ([], start))
+        # offsets[i] and offsets[i + 1] bound row i, so len(offsets) is always one more than the row count
+        self.offsets = array("Q", [header_end])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row_id):
+        return self._decode(self.offsets[row_id], self.offsets[row_id + 1])
+
+    def _decode(self, start, end):
+        return next(self._records(start, end), ([], end))[0]
+
+    def _lines(self, pos, end):
+        # Decoded lines and their end offsets, split like a file opened with newline="" (at \n, \r\n or \r)
+        while pos < end:
+            line_end = self._map.find(b"\n", pos, end)
+            line_end = end if line_end == -1 else line_end + 1
+            # A \r directly before the \n belongs to it
+            stop = line_end - 2 if self._map[line_end - 2:line_end] == b"\r\n" else line_end
+            cr = self._map.find(b"\r", pos, stop)
+            while cr != -1:
+                yield self._map[pos:cr + 1].decode(self.encoding, errors="replace"), cr + 1
+                pos = cr + 1
+                cr = self._map.find(b"\r", pos, stop)
+            yield self._map[pos:line_end].decode(self.encoding, errors="replace"), line_end
+            pos = line_end
+
+    def _records(self, pos, end=None):
+        """
+        Yield (row, end offset) for each record from pos. csv.reader itself decides
+        where records end, so offsets and column values always agree on the rows.
+        """
+        line_end = pos
+
+        def lines():
+            nonlocal line_end
+            for line, line_end in self._lines(pos, len(self._map) if end is None else end):
+                yield line
+
+        # The reader pulls only the lines of one record before yielding it
+        for row in csv.reader(lines()):
+            yield row, line_end
+
+    def scan(self, progress=None, cancelled=None):
+        """Index the row offsets, reporting the row count every LOAD_BATCH_ROWS rows."""
+        for row, end in self._records(self.offsets[-1]):
+            if row:
+                self.offsets.append(end)
+            else:
+                # Blank lines are not rows; fold them into the previous row's span
+                self.offsets[-1] = end
+            if len(self) % LOAD_BATCH_ROWS == 0:
+                if cancelled is not None and cancelled.is_set():
+                    return False
+                if progress:
+                    progress(len(self))
+        return True
+
+    def column(self, column):
+        """Yield the raw values of one column, in row order."""
+        # csv.reader over newline="" lines from the first row on, exactly as scan() split the records;
+        # the buffered text layer is just a faster way to produce the same lines as _lines()
+        with open(self.file_path, "rb") as raw_file:
+            raw_file.seek(self.offsets[0])
+            csv_file = io.TextIOWrapper(raw_file, encoding=self.encoding, errors="replace", newline="")
+            for row in csv.reader(csv_file):
+                if row:
+                    yield row[column] if column < len(row) else ""
+
+    def load_index(self):
+        """Load the sidecar index if it matches this file; return its column values, or None."""
+        try:
+            with open(self.index_path, "rb") as index_file:
+                if index_file.readline() != INDEX_MAGIC:
+                    return None
+                header = json.loads(index_file.readline())
+                if header["signature"] != self.signature:
+                    return None
+                offsets_blob = index_file.read(header["offsets"])
+                # A truncated sidecar (e.g. an interrupted write) must not silently drop rows
+                if len(offsets_blob) != header["offsets"]:
+                    return None
+                offsets = array("Q")
+                offsets.frombytes(offsets_blob)
+                if not offsets or offsets[-1] != self.signature["size"]:
+                    return None
+                values = {}
+                for column, length in header["columns"]:
+                    blob = index_file.read(length)
+                    if len(blob) != length:
+                        return None
+                    values[column] = blob.decode("utf-8").split("\0")
+        except (OSError, ValueError, KeyError):
+            return None
+        self.offsets = offsets
+        return {column: column_values for column, column_values in values.items() if len(column_values) == len(self)}
+
+    def save_index(self, values):
+        """Persist the row offsets and the normalized values of indexed columns next to the CSV."""
+        # A NUL inside a value would break the separator, so such columns are rebuilt instead
+        blobs = [(column, "\0".join(column_values).encode("utf-8"))
+                 for column, column_values in values.items()
+                 if not any("\0" in value for value in column_values)]
+        offsets = self.offsets.tobytes()
+        header = {
+            "signature": self.signature,
+            "offsets": len(offsets),
+            "columns": [(column, len(blob)) for column, blob in blobs],
+        }
+        # Write then rename so an interrupted save never leaves a half-written sidecar behind
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as index_file:
+                index_file.write(INDEX_MAGIC)
+                index_file.write(json.dumps(header).encode("utf-8") + b"\n")
+                index_file.write(offsets)
+                for _, blob in blobs:
+                    index_file.write(blob)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not save index for {self.file_path}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+class VirtualTable:
+    """
+    Shows a sequence of row ids in a ttk.Treeview while only materializing the
+    visible window (plus VIEW_BUFFER_ROWS). Scrolling rewrites the values of a
+    fixed pool of items in place, so the cost follows the window size, not the
+    number of rows.
+    """
+
+    def __init__(self, treeview, scrollbar, get_row):
+        self.treeview = treeview
+        self.scrollbar = scrollbar
+        self.get_row = get_row
+        self.row_ids = range(0)
+        self.first = 0
+        self.items = []
+
+        scrollbar.configure(command=self.yview)
+        treeview.bind("<Configure>", lambda event: self.render())
+        treeview.bind("<MouseWheel>", self._on_mousewheel)
+        treeview.bind("<Button-4>", lambda event: self.scroll(-WHEEL_SCROLL_ROWS))
+        treeview.bind("<Button-5>", lambda event: self.scroll(WHEEL_SCROLL_ROWS))
+        treeview.bind("<Prior>", lambda event: self.scroll(-self.visible_rows()))
+        treeview.bind("<Next>", lambda event: self.scroll(self.visible_rows()))
+        treeview.bind("<Home>", lambda event: self.scroll_to(0))
+        treeview.bind("<End>", lambda event: self.scroll_to(len(self.row_ids)))
+
+    def set_rows(self, row_ids, keep_position=False):
+        self.row_ids = row_ids
+        if not keep_position:
+            self.first = 0
+        self.render()
+
+    def visible_rows(self):
+        style = ttk.Style()
+        row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        # Leave room for the heading row
+        return max(1, (self.treeview.winfo_height() - row_height) // row_height)
+
+    def render(self):
+        visible = self.visible_rows()
+        self.first = max(0, min(self.first, len(self.row_ids) - visible))
+        window = self.row_ids[self.first:self.first + visible + VIEW_BUFFER_ROWS]
+
+        # Grow or shrink the item pool to the window size, then rewrite values in place
+        while len(self.items) < len(window):
+            self.items.append(self.treeview.insert("", "end"))
+        if len(self.items) > len(window):
+            self.treeview.delete(*self.items[len(window):])
+            del self.items[len(window):]
+        for item, row_id in zip(self.items, window):
+            self.treeview.item(item, values=self.get_row(row_id))
+
+        if len(self.row_ids):
+            total = len(self.row_ids)
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        self.scroll_to(self.first + rows)
+        return "break"
+
+    def scroll_to(self, first):
+        self.first = first
+        self.render()
+        return "break"
+
+    def yview(self, *args):
+        # Scrollbar protocol: ("moveto", fraction) or ("scroll", count, "units" | "pages")
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.row_ids)))
+        elif args[0] == "scroll":
+            count = int(args[1])
+            self.scroll(count * self.visible_rows() if args[2] == "pages" else count)
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS reports small deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll(-notches * WHEEL_SCROLL_ROWS)
+
+
+class BackgroundWorker:
+    """
+    Runs one job at a time on a daemon thread and hands the messages it posts
+    to the Tk main thread through after(). Starting a job supersedes the
+    previous one: it is asked to stop and its remaining messages are dropped.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.messages = queue.Queue()
+        self.generation = 0
+        self.cancelled = threading.Event()
+        self.handler = None
+        self._poll()
+
+    def start(self, job, handler):
+        """Run job(post, cancelled) on a worker thread; handler(*message) receives its posts on the UI thread."""
+        self.cancelled.set()
+        self.cancelled = threading.Event()
+        self.generation += 1
+        self.handler = handler
+        generation, cancelled = self.generation, self.cancelled
+
+        def post(*message):
+            self.messages.put((generation, message))
+
+        def run():
+            try:
+                job(post, cancelled)
+            except Exception as e:
+                post("error", e)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _poll(self):
+        for _ in range(MAX_MESSAGES_PER_POLL):
+            try:
+                generation, message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self.generation:
+                self.handler(*message)
+        self.widget.after(POLL_INTERVAL_MS, self._poll)
+
+
+def read_csv_job(file_path):
+    """Build a worker job that opens a CSV store, indexes its row offsets in batches and builds the search index."""
+    def job(post, cancelled):
+        store = CsvStore(file_path)
+        post("headers", store.headers, store)
+
+        # A sidecar index from an earlier open of the same file skips the scan entirely
+        values = store.load_index()
+        if values is None:
+            # Offsets are appended to the store the UI is already displaying from
+            if not store.scan(lambda count: post("rows", count), cancelled):
+                return
+        post("rows", len(store))
+
+        # Build the search index once per load; the item number column is indexed up front
+        index = SearchIndex(store, values)
+        index.prefix_index(0)
+        if values is None:
+            store.save_index({0: index.values(0)})
+        # Searching can start now; the n-gram index finishes in the background (searches wait on it)
+        post("done", index)
+        index.ngram_index(0)
+    return job
+
+
+def load_csv(file_path, view, worker, on_loaded=None, on_status=print, on_sort=None):
+    global search_index
+    global column_query
+    global last_search
+    search_index = None
+    column_query = None
+    last_search = None
+
+    def handle(kind, *payload):
+        global all_data  # Store all data for filtering
+        global search_index
+        global column_query
+        if kind == "headers":
+            if isinstance(all_data, CsvStore):
+                all_data.close()
+            headers, all_data = payload
 
             # Set up the Treeview columns
+            treeview = view.treeview
             treeview["columns"] = headers
             treeview["show"] = "headings"  # Show only headers
-            for header in headers:
-                treeview.heading(header, text=header)
+            for position, header in enumerate(headers):
+                # Clicking a header sorts the displayed rows by that column
+                command = (lambda column=position: on_sort(column)) if on_sort else ""
+                treeview.heading(header, text=header, command=command)
                 treeview.column(header, anchor="center")
+            view.set_rows(range(0))
+            if on_loaded:
+                on_loaded(headers)
+        elif kind == "rows":
+            # Show rows as they stream in without jumping back to the top
+            view.set_rows(range(payload[0]), keep_position=True)
+            on_status(f"Loading... {payload[0]} rows")
+        elif kind == "done":
+            search_index = payload[0]
+            column_query = ColumnQuery(search_index, all_data.headers)
+            on_status(f"{len(all_data)} rows")
+        elif kind == "error":
+            on_status(f"Error loading CSV: {payload[0]}")
+
+    worker.start(read_csv_job(file_path), handle)
+
+
+def filter_csv(view, worker, query, column=0, mode="substring", on_status=print):
+    global last_search
+    # Searches wait for the index; typing again once loading finishes re-runs them
+    if search_index is None:
+        return
+    index = search_index
+    engine = column_query
+    previous = last_search
+    normalized = query.strip().lower()
+
+    # A longer query in the same column/mode can only match a subset of the previous result
+    narrow = (
+        previous is not None and previous[0] and normalized.startswith(previous[0])
+        and previous[1:3] == (column, mode) and mode in ("substring", "prefix"))
+
+    def job(post, cancelled):
+        if mode == "query":
+            # Column queries keep their own syntax, so they get the raw text
+            row_ids = engine.run(query)
+        elif narrow:
+            row_ids = index.narrow(previous[3], normalized, column, mode)
+        else:
+            row_ids = index.search(normalized, column, mode)
+        post("results", row_ids)
+
+    def handle(kind, *payload):
+        global last_search
+        # Drop results computed against a file that has since been replaced
+        if index is not search_index:
+            return
+        if kind == "results":
+            row_ids = payload[0]
+            last_search = (normalized, column, mode, row_ids)
+            view.set_rows(row_ids)
+            on_status(f"{len(row_ids)} matching rows")
+        elif kind == "error":
+            on_status(f"Error searching: {payload[0]}")
 
-            # Clear existing rows
-            for row in treeview.get_children():
-                treeview.delete(row)
+    worker.start(job, handle)
 
-            # Insert rows from CSV
-            for row in reader:
-                all_data.append(row)
-                treeview.insert("", "end", values=row)
-    except Exception as e:
-        print(f"Error loading CSV: {e}")
 
+def sort_csv(view, worker, column, descending=False, on_status=print):
+    # Sorts the rows currently displayed, so it composes with any search or query
+    if column_query is None:
+        return
+    index = search_index
+    engine = column_query
+    row_ids = view.row_ids
 
-def filter_csv(treeview, query):
-    # Clear existing rows
-    for row in treeview.get_children():
-        treeview.delete(row)
+    def job(post, cancelled):
+        post("sorted", engine.sort(row_ids, column, descending))
 
-    # Filter data and re-insert rows
-    filtered_data = [
-        # Search by Item Number
-        row for row in all_data if query.lower() in row[0].lower()]
-    for row in filtered_data:
-        treeview.insert("", "end", values=row)
+    def handle(kind, *payload):
+        if index is not search_index:
+            return
+        if kind == "sorted":
+            view.set_rows(payload[0])
+        elif kind == "error":
+            on_status(f"Error sorting: {payload[0]}")
 
+    worker.start(job, handle)
 
-def open_file(treeview):
+
+def open_file(view, worker, column_box, on_status=print, on_sort=None):
     file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
     if file_path:
-        load_csv(file_path, treeview)
+        def on_loaded(headers):
+            column_box["values"] = headers
+            column_box.current(0)
+        load_csv(file_path, view, worker, on_loaded, on_status, on_sort)
 
 
 def main():
     global all_data
-    all_data = []  # Store all rows of data for filtering
+    global search_index
+    global column_query
+    global last_search
+    all_data = []  # Rows of the loaded file (a CsvStore once a file is open)
+    search_index = None  # Built by load_csv
+    column_query = None  # Column query engine over search_index
+    last_search = None  # (query, column, mode, row ids) of the last completed search
 
     root = tk.Tk()
     root.title("Packsize CSV Viewer")
 
+    # Parsing and searching run off the Tk thread
+    load_worker = BackgroundWorker(root)
+    search_worker = BackgroundWorker(root)
+
     # Search bar
     search_frame = tk.Frame(root)
     search_frame.pack(fill="x", padx=10, pady=5)
@@ -69,24 +782,93 @@ def main():
     search_entry = tk.Entry(search_frame)
     search_entry.pack(side="left", fill="x", expand=True, padx=5)
 
+    # Column and match mode selectors (column 0 is the item number)
+    column_box = ttk.Combobox(search_frame, state="readonly", width=18)
+    column_box.pack(side="left", padx=5)
+
+    mode_box = ttk.Combobox(search_frame, state="readonly", width=10, values=list(SEARCH_MODES))
+    mode_box.current(0)
+    mode_box.pack(side="left", padx=5)
+
+    status_var = tk.StringVar(value="Open a CSV file to begin.")
+
+    def run_search():
+        column = max(column_box.current(), 0)
+        mode = SEARCH_MODES[mode_box.get()]
+        if mode == "query":
+            search_label.config(text="Query (e.g. Length >= 10 AND Width < 20):")
+        else:
+            search_label.config(text=f"Search {column_box.get() or 'Item Number'}:")
+        sort_state.clear()
+        show_sort_arrow()
+        filter_csv(view, search_worker, search_entry.get(), column, mode, on_status=status_var.set)
+
+    # Column being sorted and its direction; a new search returns to file order
+    sort_state = {}
+
+    def show_sort_arrow():
+        for position, header in enumerate(view.treeview["columns"]):
+            arrow = ""
+            if position == sort_state.get("column"):
+                arrow = " \u25bc" if sort_state["descending"] else " \u25b2"
+            view.treeview.heading(header, text=header + arrow)
+
+    def sort_by(column):
+        descending = sort_state.get("column") == column and not sort_state.get("descending")
+        sort_state.update(column=column, descending=descending)
+        show_sort_arrow()
+        sort_csv(view, search_worker, column, descending, on_status=status_var.set)
+
+    # Search as you type, once typing pauses for SEARCH_DEBOUNCE_MS
+    pending_search = None
+
+    def schedule_search(event=None):
+        nonlocal pending_search
+        # Half-typed column queries rarely parse, so they only run on Enter or the Search button
+        if SEARCH_MODES[mode_box.get()] == "query" and event is not None and event.widget is search_entry:
+            return
+        if pending_search is not None:
+            root.after_cancel(pending_search)
+
+        def fire():
+            nonlocal pending_search
+            pending_search = None
+            run_search()
+        pending_search = root.after(SEARCH_DEBOUNCE_MS, fire)
+
+    search_entry.bind("<KeyRelease>", schedule_search)
+    search_entry.bind("<Return>", lambda event: run_search())
+    column_box.bind("<<ComboboxSelected>>", schedule_search)
+    mode_box.bind("<<ComboboxSelected>>", schedule_search)
+
     search_button = tk.Button(
-        search_frame, text="Search", command=lambda: filter_csv(treeview, search_entry.get()))
+        search_frame, text="Search", command=run_search)
     search_button.pack(side="right")
 
-    # Treeview for displaying CSV content
-    treeview = ttk.Treeview(root)
-    treeview.pack(expand=True, fill="both")
-
-    # Add Scrollbars
-    # vsb = ttk.Scrollbar(root, orient="vertical", command=treeview.yview)
-    # vsb.pack(side="right", fill="y")
-    # treeview.configure(yscrollcommand=vsb.set)
+    def open_csv():
+        sort_state.clear()
+        open_file(view, load_worker, column_box, status_var.set, sort_by)
 
     # Button to open CSV
-    open_button = tk.Button(root, text="Open CSV",
-                            command=lambda: open_file(treeview))
+    open_button = tk.Button(root, text="Open CSV", command=open_csv)
     open_button.pack(side="bottom", pady=5)
 
+    status_label = tk.Label(root, textvariable=status_var, anchor="w")
+    status_label.pack(side="bottom", fill="x", padx=10)
+
+    # Treeview for displaying CSV content
+    table_frame = tk.Frame(root)
+    table_frame.pack(expand=True, fill="both")
+
+    # Add Scrollbars; the scrollbar drives the virtual table rather than the Treeview itself
+    vsb = ttk.Scrollbar(table_frame, orient="vertical")
+    vsb.pack(side="right", fill="y")
+
+    treeview = ttk.Treeview(table_frame)
+    treeview.pack(side="left", expand=True, fill="both")
+
+    view = VirtualTable(treeview, vsb, lambda row_id: all_data[row_id])
+
     root.geometry("800x600")
     root.mainloop()
 
@@ -2,40 +2,749 @@
 Module to convert an MP4 video to a GIF using a GUI interface.
 The user can select an input MP4 video file, specify an output GIF file,
 and adjust the trimming and quality settings for the GIF conversion.
+Many files (or a whole folder) can be queued and converted in parallel.
 The conversion process is handled by ffmpeg, which must be installed on the system.
+
+The conversion engine (convert_to_gif, ConversionQueue, convert_files) can be
+imported without starting Tk, and the module runs headless from the command line:
+    python ffmpeg_ui.py "clips/**/*.mp4" --quality 4 --jobs 4 -o gifs
+Run it without arguments to open the window.
 """
+import argparse
+import collections
+import glob
+import hashlib
+import itertools
+import json
 import os
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import queue
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
 
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+except ImportError:  # Headless machines can still use the engine and the command line
+    tk = None
 
-def get_video_duration(video_file):
-    """Retrieve the duration of a video file using ffprobe."""
+# Number of ffmpeg processes run at the same time by the conversion queue
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Generated GIF palettes, reused across conversions of the same trim window and scale
+PALETTE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ffmpeg_ui", "palettes")
+# Frame rate sampled by palettegen; independent of the output fps so palettes can be shared
+PALETTE_SAMPLE_FPS = 10
+# Ordered dithering compresses much better in GIF than error diffusion
+DEFAULT_DITHER = "bayer:bayer_scale=5"
+# ffprobe results keyed on path, size and mtime, so unchanged files are never probed twice
+METADATA_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ffmpeg_ui", "metadata.json")
+METADATA_CACHE_ENTRIES = 5000
+# Frame rate and width per quality level; never above what the source video has
+QUALITY_PRESETS = {quality: (10 + quality * 5, 240 + quality * 80) for quality in range(1, 6)}
+# Lines of ffmpeg stderr kept for error messages
+STDERR_TAIL_LINES = 20
+# Seconds a cancelled ffmpeg gets to exit before it is killed
+KILL_TIMEOUT = 5
+# One JSON line per finished queue job, for tuning the quality presets
+METRICS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ffmpeg_ui", "metrics.jsonl")
+# Shortest part of a trim window worth decoding in its own ffmpeg process
+SEGMENT_MIN_SECONDS = 10
+
+
+def _parse_rate(rate):
+    """Turn an ffprobe frame rate such as "30000/1001" into a float, or None."""
+    try:
+        numerator, _, denominator = rate.partition("/")
+        value = float(numerator) / float(denominator or 1)
+    except (AttributeError, ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def probe_metadata(video_file):
+    """
+    Run ffprobe once and return duration, resolution, fps and codec of a video,
+    or None if ffprobe fails.
+    """
     try:
         ffprobe_cmd = [
             "ffprobe",
             "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
+            "-select_streams", "v:0",
+            "-show_entries", "format=duration:stream=width,height,avg_frame_rate,r_frame_rate,codec_name",
+            "-of", "json",
             video_file
         ]
         result = subprocess.run(
             ffprobe_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-        return float(result.stdout.strip())
-    except subprocess.CalledProcessError:
+        info = json.loads(result.stdout)
+        duration = float(info["format"]["duration"])
+    except (subprocess.CalledProcessError, ValueError, KeyError, TypeError, OSError):
+        return None
+    stream = (info.get("streams") or [{}])[0]
+    return {
+        "duration": duration,
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "fps": _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate")),
+        "codec": stream.get("codec_name"),
+    }
+
+
+class MetadataCache:
+    """
+    ffprobe metadata persisted as JSON and keyed on the absolute path; an entry is
+    only used while the file's size and mtime still match. Safe to use from worker threads.
+    """
+
+    def __init__(self, path=METADATA_CACHE_PATH, max_entries=METADATA_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(temp_file, self.path)
+
+    def get(self, video_file):
+        """Return the metadata of a video, probing it only if it is new or has changed."""
+        try:
+            stat = os.stat(video_file)
+        except OSError:
+            return None
+        key = os.path.abspath(video_file)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._load().get(key)
+            if entry and entry["signature"] == signature:
+                return entry["metadata"]
+
+        metadata = probe_metadata(video_file)
+        if metadata is None:
+            return None
+        with self._lock:
+            entries = self._load()
+            entries.pop(key, None)
+            entries[key] = {"signature": signature, "metadata": metadata}
+            # Drop the oldest entries; dicts keep insertion order
+            for stale in list(entries)[:max(0, len(entries) - self.max_entries)]:
+                del entries[stale]
+            try:
+                self._save()
+            except OSError:
+                pass  # The cache is an optimisation; probing again later is fine
+        return metadata
+
+
+metadata_cache = MetadataCache()
+
+
+def probe_duration(video_file):
+    """Return the duration of a video file in seconds, or None if ffprobe fails."""
+    metadata = metadata_cache.get(video_file)
+    return metadata["duration"] if metadata else None
+
+
+def quality_settings(quality, metadata=None):
+    """Return (fps, width) for a quality level, capped at the source frame rate and width."""
+    fps, scale = QUALITY_PRESETS[quality]
+    if metadata:
+        if metadata.get("fps"):
+            fps = min(fps, max(1, round(metadata["fps"])))
+        if metadata.get("width"):
+            scale = min(scale, metadata["width"])
+    return fps, scale
+
+
+def describe_metadata(metadata):
+    """One-line summary of a video's metadata for the UI."""
+    parts = []
+    if metadata.get("width") and metadata.get("height"):
+        parts.append(f"{metadata['width']}x{metadata['height']}")
+    if metadata.get("fps"):
+        parts.append(f"{metadata['fps']:.2f} fps")
+    if metadata.get("codec"):
+        parts.append(metadata["codec"])
+    parts.append(f"{metadata['duration']:.1f}s")
+    return ", ".join(parts)
+
+
+def get_video_duration(video_file):
+    """Retrieve the duration of a video file using the cached ffprobe metadata."""
+    video_duration = probe_duration(video_file)
+    if video_duration is None:
         messagebox.showerror(
             "Error", "Failed to get video duration. Ensure ffprobe is installed and the input file is valid.")
+    return video_duration
+
+
+def gif_output_path(input_file, output_dir=None):
+    """Return the GIF path for an input video, next to it unless an output folder is given."""
+    base_name = os.path.splitext(os.path.basename(input_file))[0] + ".gif"
+    return os.path.join(output_dir or os.path.dirname(input_file), base_name)
+
+
+def palette_path(input_file, start_trim, duration, scale, cache_dir=None):
+    """
+    Return the cache path of the palette for a trim window and scale of a file.
+    fps and dither are not part of the key, so re-encoding with other values reuses the palette.
+    """
+    stat = os.stat(input_file)
+    key = f"{os.path.abspath(input_file)}|{stat.st_size}|{stat.st_mtime_ns}|{start_trim}|{duration}|{scale}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir or PALETTE_CACHE_DIR, f"{digest}.png")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
         return None
 
 
+class ConversionCancelled(Exception):
+    """Raised when a conversion is cancelled while ffmpeg is running."""
+
+
+class ConversionMonitor:
+    """
+    Follows the ffmpeg processes of one conversion: combines their -progress
+    output into a single fraction, adds up their CPU time and lets another
+    thread cancel them. on_progress(monitor) is called from the thread running ffmpeg.
+    """
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.cancelled = False
+        self.started = time.perf_counter()
+        self.cpu_seconds = 0.0
+        self.details = {}
+        self._passes = {}
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def add_pass(self, name, weight, seconds):
+        """Register an ffmpeg pass that produces `seconds` of media and counts `weight` towards the total."""
+        with self._lock:
+            self._passes[name] = {"weight": weight, "seconds": seconds, "done": 0.0, "fps": 0.0, "speed": 0.0}
+
+    def update(self, name, values):
+        """Apply one -progress block of a pass and report the new state."""
+        with self._lock:
+            progress_pass = self._passes.get(name)
+            if progress_pass is None:
+                return
+            if values.get("progress") == "end":
+                progress_pass.update(done=1.0, fps=0.0, speed=0.0)
+            else:
+                out_time = _to_float(values.get("out_time_us") or values.get("out_time_ms"))
+                if out_time is not None and progress_pass["seconds"]:
+                    progress_pass["done"] = min(1.0, out_time / 1e6 / progress_pass["seconds"])
+                progress_pass["fps"] = _to_float(values.get("fps")) or 0.0
+                progress_pass["speed"] = _to_float(values.get("speed", "").rstrip("x")) or 0.0
+        if self.on_progress:
+            self.on_progress(self)
+
+    @property
+    def fraction(self):
+        with self._lock:
+            total = sum(p["weight"] for p in self._passes.values())
+            done = sum(p["weight"] * p["done"] for p in self._passes.values())
+        return done / total if total else 0.0
+
+    @property
+    def throughput(self):
+        """Return (fps, speed) summed over the passes that are still running."""
+        with self._lock:
+            running = [p for p in self._passes.values() if p["done"] < 1.0]
+            return sum(p["fps"] for p in running), sum(p["speed"] for p in running)
+
+    @property
+    def eta(self):
+        """Estimated seconds left, or None until there is some progress to extrapolate from."""
+        fraction = self.fraction
+        if fraction <= 0:
+            return None
+        return (time.perf_counter() - self.started) * (1 - fraction) / fraction
+
+    def attach(self, process):
+        with self._lock:
+            if self.cancelled:
+                process.kill()
+            self._processes.add(process)
+
+    def detach(self, process, cpu_seconds):
+        with self._lock:
+            self._processes.discard(process)
+            self.cpu_seconds += cpu_seconds or 0.0
+
+    def cancel(self):
+        """
+        Stop every running ffmpeg process of this conversion; later passes are not started.
+        Processes still running KILL_TIMEOUT seconds after being asked to exit are killed.
+        """
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+        if processes:
+            timer = threading.Timer(KILL_TIMEOUT, self._kill, args=(processes,))
+            timer.daemon = True
+            timer.start()
+
+    @staticmethod
+    def _kill(processes):
+        for process in processes:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except OSError:
+                    pass
+
+
+def _wait_with_usage(process):
+    """Wait for a process and return its CPU seconds where the platform reports them (else None)."""
+    if hasattr(os, "wait4"):
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Popen.poll() inside terminate()/kill() of a cancel reaped the process first and
+            # recorded its exit code; its CPU time is lost with it
+            process.wait()
+            return None
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return usage.ru_utime + usage.ru_stime
+    process.wait()
+    return None
+
+
+def run_ffmpeg(ffmpeg_cmd, monitor=None, pass_name=None):
+    """
+    Run an ffmpeg command (whose last argument is the output) and stream its
+    -progress output to the monitor. Raises ConversionCancelled if the monitor
+    was cancelled and CalledProcessError (with the tail of stderr) if ffmpeg fails.
+    """
+    if monitor and monitor.cancelled:
+        raise ConversionCancelled()
+    cmd = ffmpeg_cmd[:-1] + ["-nostats", "-progress", "pipe:1", ffmpeg_cmd[-1]]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, errors="replace")
+    # Drain stderr on its own thread so a chatty ffmpeg cannot fill the pipe and stall
+    stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+    stderr_reader = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+    stderr_reader.start()
+    cpu_seconds = None
+    if monitor:
+        monitor.attach(process)
+    try:
+        values = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            values[key] = value
+            if key == "progress":
+                if monitor and pass_name:
+                    monitor.update(pass_name, values)
+                values = {}
+        process.stdout.close()
+        cpu_seconds = _wait_with_usage(process)
+        stderr_reader.join()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            process.wait()
+        if monitor:
+            monitor.detach(process, cpu_seconds)
+    if monitor and monitor.cancelled:
+        raise ConversionCancelled()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stderr="".join(stderr_tail).encode())
+
+
+def generate_palette(input_file, start_trim, duration, scale, threads=None, cache_dir=None, concat_file=None,
+                     monitor=None):
+    """
+    Run ffmpeg palettegen for a trim window unless its palette is already cached; return the palette path.
+    With concat_file the palette is computed from already scaled segments instead of the source video.
+    """
+    palette_file = palette_path(input_file, start_trim, duration, scale, cache_dir)
+    if os.path.isfile(palette_file):
+        return palette_file
+
+    os.makedirs(os.path.dirname(palette_file), exist_ok=True)
+    # Write under a temporary name so a parallel job never picks up a half-written palette
+    temp_file = f"{os.path.splitext(palette_file)[0]}.{os.getpid()}.{threading.get_ident()}.png"
+    if concat_file:
+        palette_cmd = [
+            "ffmpeg",
+            "-f", "concat", "-safe", "0", "-i", concat_file,
+            "-vf", f"fps={PALETTE_SAMPLE_FPS},palettegen=stats_mode=diff",
+        ]
+    else:
+        # -ss before -i seeks in the input, so only the trim window is decoded
+        palette_cmd = [
+            "ffmpeg",
+            "-ss", str(start_trim),
+            "-t", str(duration),
+            "-i", input_file,
+            "-vf", f"fps={PALETTE_SAMPLE_FPS},scale={scale}:-1:flags=lanczos,palettegen=stats_mode=diff",
+        ]
+    if threads:
+        palette_cmd += ["-threads", str(threads)]
+    palette_cmd += ["-y", temp_file]
+    try:
+        run_ffmpeg(palette_cmd, monitor, "palette")
+    except BaseException:
+        _remove_quietly(temp_file)
+        raise
+    os.replace(temp_file, palette_file)
+    return palette_file
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def segment_count(duration, segment_workers):
+    """Return how many parallel segments a trim window of the given length is split into."""
+    if not segment_workers or segment_workers < 2:
+        return 1
+    return max(1, min(segment_workers, int(duration // SEGMENT_MIN_SECONDS)))
+
+
+def encode_segment(input_file, segment_file, start, duration, fps, scale, threads=None,
+                   monitor=None, pass_name=None):
+    """Decode, resample and scale one part of the trim window into a lossless intermediate file."""
+    segment_cmd = [
+        "ffmpeg",
+        "-ss", str(start),
+        "-t", str(duration),
+        "-i", input_file,
+        "-an",
+        "-vf", f"fps={fps},scale={scale}:-1:flags=lanczos",
+        "-c:v", "ffv1", "-pix_fmt", "bgr0",
+    ]
+    if threads:
+        segment_cmd += ["-threads", str(threads)]
+    segment_cmd += ["-y", segment_file]
+    run_ffmpeg(segment_cmd, monitor, pass_name)
+    return segment_file
+
+
+def convert_segmented(input_file, output_file, start_trim, duration, fps, scale, segments,
+                      threads=None, dither=DEFAULT_DITHER, palette_cache_dir=None, monitor=None):
+    """
+    Encode a long trim window as several segments in parallel, then join them into one GIF.
+    Every segment is decoded by its own ffmpeg process; the concatenated, already scaled
+    frames share a single palette so there are no colour jumps at segment boundaries.
+    """
+    length = duration / segments
+    segment_threads = max(1, threads // segments) if threads else None
+    if monitor:
+        # Decoding the source dominates; the passes over the small intermediates are cheap
+        for number in range(segments):
+            monitor.add_pass(f"segment{number}", 3 / segments, length)
+        if not os.path.isfile(palette_path(input_file, start_trim, duration, scale, palette_cache_dir)):
+            monitor.add_pass("palette", 0.5, duration)
+        monitor.add_pass("encode", 1, duration)
+    with tempfile.TemporaryDirectory(prefix="ffmpeg_ui_") as workdir:
+        segment_files = [os.path.join(workdir, f"segment{number:03d}.mkv") for number in range(segments)]
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            futures = [
+                executor.submit(encode_segment, input_file, segment_file, start_trim + number * length,
+                                length, fps, scale, segment_threads, monitor, f"segment{number}")
+                for number, segment_file in enumerate(segment_files)
+            ]
+            for future in futures:
+                future.result()
+
+        concat_file = os.path.join(workdir, "segments.txt")
+        with open(concat_file, "w", encoding="utf-8") as f:
+            for segment_file in segment_files:
+                escaped = segment_file.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        palette_file = generate_palette(input_file, start_trim, duration, scale, threads,
+                                        palette_cache_dir, concat_file=concat_file, monitor=monitor)
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-f", "concat", "-safe", "0", "-i", concat_file,
+            "-i", palette_file,
+            "-lavfi", f"[0:v][1:v]paletteuse=dither={dither}",
+            "-y", output_file,
+        ]
+        run_ffmpeg(ffmpeg_cmd, monitor, "encode")
+    return output_file
+
+
+def convert_to_gif(input_file, output_file, start_trim, end_trim, quality, threads=None,
+                   palette=True, dither=DEFAULT_DITHER, palette_cache_dir=None, segment_workers=1,
+                   monitor=None):
+    """
+    Convert a video to a trimmed GIF without touching the UI.
+    With palette=True (the default) the GIF uses a generated, cached palette
+    (palettegen/paletteuse); palette=False is the original single-pass encode.
+    Trim windows of at least 2 * SEGMENT_MIN_SECONDS are split across up to
+    segment_workers parallel ffmpeg processes when the palette pipeline is used.
+    A ConversionMonitor receives the progress of every ffmpeg pass and can cancel them.
+    Raises ValueError for invalid input, ConversionCancelled if the monitor was
+    cancelled and CalledProcessError if ffmpeg fails.
+    """
+    metadata = metadata_cache.get(input_file)
+    if metadata is None:
+        raise ValueError(f"Failed to get video duration of {input_file}.")
+    video_duration = metadata["duration"]
+
+    # Ensure trim values are within valid range
+    if start_trim + end_trim >= video_duration:
+        raise ValueError("Trim values exceed video duration.")
+
+    # Adjust output file extension to .gif
+    output_file = os.path.splitext(output_file)[0] + ".gif"
+
+    # Frame rate and resolution increase with quality, up to those of the source
+    fps, scale = quality_settings(quality, metadata)
+    duration = video_duration - start_trim - end_trim
+
+    segments = segment_count(duration, segment_workers) if palette else 1
+    if monitor:
+        monitor.details.update(fps=fps, scale=scale, clip_seconds=duration, segments=segments)
+    try:
+        if segments > 1:
+            return convert_segmented(input_file, output_file, start_trim, duration, fps, scale, segments,
+                                     threads, dither, palette_cache_dir, monitor)
+
+        # Construct ffmpeg command for GIF conversion; -ss before -i seeks in the input,
+        # so the cost depends on the length of the clip and not on where it starts
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-ss", str(start_trim),
+            "-t", str(duration),
+            "-i", input_file,
+        ]
+        if palette:
+            if monitor and not os.path.isfile(palette_path(input_file, start_trim, duration, scale,
+                                                           palette_cache_dir)):
+                monitor.add_pass("palette", 1, duration)
+            if monitor:
+                monitor.add_pass("encode", 1, duration)
+            palette_file = generate_palette(input_file, start_trim, duration, scale, threads, palette_cache_dir,
+                                            monitor=monitor)
+            ffmpeg_cmd += [
+                "-i", palette_file,
+                "-lavfi", f"fps={fps},scale={scale}:-1:flags=lanczos[x];[x][1:v]paletteuse=dither={dither}",
+            ]
+        else:
+            if monitor:
+                monitor.add_pass("encode", 1, duration)
+            ffmpeg_cmd += [
+                "-vf", f"fps={fps},scale={scale}:-1:flags=lanczos",
+            ]
+        if threads:
+            # Share the cores between the processes running in parallel
+            ffmpeg_cmd += ["-threads", str(threads)]
+        ffmpeg_cmd += ["-y", output_file]
+
+        # Execute ffmpeg command
+        run_ffmpeg(ffmpeg_cmd, monitor, "encode")
+    except ConversionCancelled:
+        # Never leave a truncated GIF behind
+        _remove_quietly(output_file)
+        raise
+    return output_file
+
+
+def benchmark_palette(input_file, start_trim=0, end_trim=0, quality=3):
+    """Compare output size and wall-clock time of the single-pass and the palette pipelines."""
+    with tempfile.TemporaryDirectory() as workdir:
+        cache_dir = os.path.join(workdir, "palettes")
+        runs = [
+            ("single-pass", {"palette": False}),
+            ("palette, cold cache", {"palette_cache_dir": cache_dir}),
+            ("palette, warm cache", {"palette_cache_dir": cache_dir}),
+            ("palette, warm, no dither", {"palette_cache_dir": cache_dir, "dither": "none"}),
+            ("palette, warm, segmented", {"palette_cache_dir": cache_dir, "segment_workers": DEFAULT_WORKERS}),
+        ]
+        results = []
+        print(f"{'Pipeline':<26} {'Seconds':>8} {'Size (KiB)':>11}")
+        for number, (label, options) in enumerate(runs):
+            output_file = os.path.join(workdir, f"run{number}.gif")
+            start = time.perf_counter()
+            convert_to_gif(input_file, output_file, start_trim, end_trim, quality, **options)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(output_file)
+            results.append((label, elapsed, size))
+            print(f"{label:<26} {elapsed:>8.2f} {size / 1024:>11.1f}")
+    return results
+
+
+class ConversionJob:
+    """One queued video-to-GIF conversion with its own trim and quality settings."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, input_file, output_file, start_trim, end_trim, quality):
+        self.id = next(self._ids)
+        self.input_file = input_file
+        self.output_file = output_file
+        self.start_trim = start_trim
+        self.end_trim = end_trim
+        self.quality = quality
+        self.status = "Pending"
+        self.error = None
+        self.monitor = ConversionMonitor()
+
+    def cancel(self):
+        """Cancel the job: a queued job is skipped, a running one has its ffmpeg processes stopped."""
+        self.monitor.cancel()
+
+
+def write_metrics(record, path=METRICS_PATH):
+    """Append one conversion's metrics as a JSON line."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def job_metrics(job, wall_seconds):
+    """Build the metrics record of a finished job: wall and CPU time, output size and realtime factor."""
+    details = job.monitor.details
+    clip_seconds = details.get("clip_seconds")
+    done = job.status == "Done"
+    output_bytes = os.path.getsize(job.output_file) if done else None
+    return {
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "input": job.input_file,
+        "output": job.output_file,
+        "status": job.status,
+        "quality": job.quality,
+        "fps": details.get("fps"),
+        "scale": details.get("scale"),
+        "segments": details.get("segments"),
+        "clip_seconds": clip_seconds,
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_seconds": round(job.monitor.cpu_seconds, 3),
+        "output_bytes": output_bytes,
+        # Seconds of video converted per second of wall time
+        "realtime_factor": round(clip_seconds / wall_seconds, 3) if done and wall_seconds else None,
+    }
+
+
+class ConversionQueue:
+    """
+    Runs conversion jobs on a pool of worker threads, one ffmpeg process per
+    worker. A job that starts while few others are pending gets a larger share
+    of the cores and splits long clips into parallel segments.
+    on_update(job) is called from the worker threads whenever a job changes status
+    or reports progress. Every job that ran is appended to metrics_path (None disables it).
+    options are extra keyword arguments for convert_to_gif, such as palette or dither.
+    """
+
+    def __init__(self, workers=None, on_update=None, metrics_path=METRICS_PATH, options=None):
+        self.workers = workers or DEFAULT_WORKERS
+        self.threads_per_job = max(1, (os.cpu_count() or 1) // self.workers)
+        self.on_update = on_update
+        self.options = options or {}
+        self.metrics_path = metrics_path
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        job.status = "Queued"
+        job.monitor.on_progress = lambda monitor: self._notify(job)
+        with self._lock:
+            self._pending += 1
+        self._notify(job)
+        return self.executor.submit(self._run, job)
+
+    def _core_share(self):
+        with self._lock:
+            return max(self.threads_per_job, (os.cpu_count() or 1) // max(1, self._pending))
+
+    def _run(self, job):
+        if job.monitor.cancelled:
+            with self._lock:
+                self._pending -= 1
+            job.status = "Cancelled"
+            self._notify(job)
+            return job
+        job.status = "Converting"
+        job.monitor.start()
+        self._notify(job)
+        share = self._core_share()
+        try:
+            job.output_file = convert_to_gif(
+                job.input_file, job.output_file, job.start_trim, job.end_trim, job.quality,
+                **{"threads": share, "segment_workers": share, **self.options}, monitor=job.monitor)
+            job.status = "Done"
+        except ConversionCancelled:
+            job.status = "Cancelled"
+        except subprocess.CalledProcessError as e:
+            job.status = "Failed"
+            stderr = (e.stderr or b"").decode(errors="replace").strip()
+            job.error = stderr.splitlines()[-1] if stderr else str(e)
+        except Exception as e:
+            job.status = "Failed"
+            job.error = str(e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        if self.metrics_path:
+            try:
+                write_metrics(job_metrics(job, time.perf_counter() - job.monitor.started), self.metrics_path)
+            except OSError:
+                pass  # Metrics must never fail a conversion
+        self._notify(job)
+        return job
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def add_job(input_file, output_file):
+    """Add a conversion job using the current trim and quality settings."""
+    job = ConversionJob(input_file, output_file, start_slider.get(), end_slider.get(), quality_slider.get())
+    jobs[job.id] = job
+    job_list.insert("", "end", iid=str(job.id), values=(
+        os.path.basename(input_file), f"{job.start_trim}s / {job.end_trim}s", job.quality, job.status))
+    return job
+
+
 def trim_to_gif():
-    """Convert the input MP4 video to a trimmed GIF."""
+    """Queue the input MP4 video for conversion to a trimmed GIF."""
     input_file = input_file_var.get()
     output_file = output_file_var.get()
-    start_trim = start_slider.get()
-    end_trim = end_slider.get()
-    quality = quality_slider.get()
 
     # Validate inputs
     if not input_file or not os.path.isfile(input_file):
@@ -46,39 +755,92 @@ def trim_to_gif():
         messagebox.showerror("Error", "Please specify an output file.")
         return
 
-    video_duration = get_video_duration(input_file)
-    if video_duration is None:
+    conversion_queue.submit(add_job(input_file, output_file))
+
+
+def add_files_to_queue():
+    """Add one job per selected MP4 file; each GIF is written next to its video."""
+    file_paths = filedialog.askopenfilenames(filetypes=[("MP4 files", "*.mp4")])
+    for file_path in file_paths:
+        add_job(file_path, gif_output_path(file_path))
+
+
+def add_folder_to_queue():
+    """Add one job per MP4 file in a folder."""
+    folder = filedialog.askdirectory()
+    if not folder:
         return
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(".mp4"):
+            file_path = os.path.join(folder, name)
+            add_job(file_path, gif_output_path(file_path))
 
-    # Ensure trim values are within valid range
-    if start_trim + end_trim >= video_duration:
-        messagebox.showerror("Error", "Trim values exceed video duration.")
+
+def start_queue():
+    """Submit every pending job to the worker pool."""
+    for job in jobs.values():
+        if job.status == "Pending":
+            conversion_queue.submit(job)
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def job_status_text(job):
+    if job.error:
+        return f"{job.status}: {job.error}"
+    if job.status == "Converting":
+        return f"Converting {job.monitor.fraction:.0%}"
+    return job.status
+
+
+def show_job_progress(job):
+    """Show the progress bar, encode fps/speed and ETA of one job."""
+    progress_bar["value"] = 100 if job.status == "Done" else job.monitor.fraction * 100
+    if job.status != "Converting":
+        progress_text_var.set(f"{os.path.basename(job.input_file)}: {job.status}")
         return
+    fps, speed = job.monitor.throughput
+    eta = job.monitor.eta
+    eta_text = format_seconds(eta) if eta is not None else "--:--"
+    progress_text_var.set(
+        f"{os.path.basename(job.input_file)}: {fps:.0f} fps, {speed:.2f}x, ETA {eta_text}")
 
-    # Adjust output file extension to .gif
-    output_file = os.path.splitext(output_file)[0] + ".gif"
 
-    # Calculate quality settings
-    fps = 10 + (quality * 5)  # Frame rate increases with quality
-    scale = 240 + (quality * 80)  # Resolution increases with quality
+def selected_jobs():
+    return [jobs[int(iid)] for iid in job_list.selection()]
 
-    try:
-        # Construct ffmpeg command for GIF conversion
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-i", input_file,
-            "-ss", str(start_trim),
-            "-t", str(video_duration - start_trim - end_trim),
-            "-vf", f"fps={fps},scale={scale}:-1:flags=lanczos",
-            "-y", output_file
-        ]
 
-        # Execute ffmpeg command
-        subprocess.run(ffmpeg_cmd, check=True, stderr=subprocess.PIPE)
-        messagebox.showinfo(
-            "Success", f"GIF saved successfully: {output_file}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to process video: {str(e)}")
+def cancel_selected_jobs():
+    """Cancel the selected jobs, or every unfinished job if none is selected."""
+    for job in selected_jobs() or list(jobs.values()):
+        if job.status in ("Pending", "Queued", "Converting"):
+            job.cancel()
+            if job.status == "Pending":
+                job.status = "Cancelled"
+                job_list.set(str(job.id), "status", job.status)
+
+
+def poll_job_updates():
+    """Apply job status changes posted by the worker threads (Tk is only touched here)."""
+    updated = {}
+    try:
+        while True:
+            job = job_updates.get_nowait()
+            updated[job.id] = job
+    except queue.Empty:
+        pass
+    for job in updated.values():
+        job_list.set(str(job.id), "status", job_status_text(job))
+    # The progress panel follows the selected job, else the last one that reported
+    shown = selected_jobs()
+    if shown:
+        show_job_progress(shown[0])
+    elif updated:
+        show_job_progress(list(updated.values())[-1])
+    root.after(100, poll_job_updates)
 
 
 def select_input_file():
@@ -90,6 +852,17 @@ def select_input_file():
         if video_duration:
             start_slider.config(to=video_duration)
             end_slider.config(to=video_duration)
+            metadata = metadata_cache.get(file_path)
+            video_info_var.set(describe_metadata(metadata))
+            update_quality_label()
+
+
+def update_quality_label(*_):
+    """Show the frame rate and width the selected quality produces for the input video."""
+    input_file = input_file_var.get()
+    metadata = metadata_cache.get(input_file) if os.path.isfile(input_file) else None
+    fps, scale = quality_settings(quality_slider.get(), metadata)
+    quality_info_var.set(f"{scale}px wide, {fps} fps")
 
 
 def select_output_file():
@@ -100,49 +873,177 @@ def select_output_file():
         output_file_var.set(file_path)
 
 
-# Create the main window
-root = tk.Tk()
-root.title("MP4 to GIF Converter")
-root.geometry("600x450")
-
-# Input File Selection
-input_file_var = tk.StringVar()
-tk.Label(root, text="Input MP4 Video:").grid(row=0, column=0, padx=10, pady=10)
-tk.Entry(root, textvariable=input_file_var, width=50).grid(
-    row=0, column=1, padx=10, pady=10)
-tk.Button(root, text="Browse", command=select_input_file).grid(
-    row=0, column=2, padx=10, pady=10)
-
-# Output File Selection
-output_file_var = tk.StringVar()
-tk.Label(root, text="Output GIF File:").grid(row=1, column=0, padx=10, pady=10)
-tk.Entry(root, textvariable=output_file_var, width=50).grid(
-    row=1, column=1, padx=10, pady=10)
-tk.Button(root, text="Browse", command=select_output_file).grid(
-    row=1, column=2, padx=10, pady=10)
-
-# Trimming sliders
-tk.Label(root, text="Trim Seconds from Start:").grid(
-    row=2, column=0, padx=10, pady=10)
-start_slider = tk.Scale(root, from_=0, to=100,
-                        orient=tk.HORIZONTAL, length=300)
-start_slider.grid(row=2, column=1, padx=10, pady=10)
-
-tk.Label(root, text="Trim Seconds from End:").grid(
-    row=3, column=0, padx=10, pady=10)
-end_slider = tk.Scale(root, from_=0, to=100, orient=tk.HORIZONTAL, length=300)
-end_slider.grid(row=3, column=1, padx=10, pady=10)
-
-# Quality slider
-tk.Label(root, text="GIF Quality (1-5):").grid(row=4,
-                                               column=0, padx=10, pady=10)
-quality_slider = tk.Scale(
-    root, from_=1, to=5, orient=tk.HORIZONTAL, length=300)
-quality_slider.grid(row=4, column=1, padx=10, pady=10)
-
-# Convert button
-tk.Button(root, text="Convert to GIF", command=trim_to_gif).grid(
-    row=5, column=1, pady=20)
-
-# Run the application
-root.mainloop()
+def find_videos(patterns):
+    """Expand files, directories (their .mp4 files) and glob patterns into a sorted list of videos."""
+    videos = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.mp4")
+        if any(char in pattern for char in "*?["):
+            videos.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        elif os.path.isfile(pattern):
+            videos.add(pattern)
+    return sorted(videos)
+
+
+def convert_files(input_files, output_dir=None, start_trim=0, end_trim=0, quality=3, jobs=None,
+                  on_update=None, **options):
+    """
+    Convert many videos to GIFs without any UI, `jobs` at a time, and return the finished
+    ConversionJob objects. GIFs are written next to their videos unless output_dir is given.
+    Extra keyword arguments (palette, dither, segment_workers, ...) are passed to convert_to_gif.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    conversion_queue = ConversionQueue(workers=jobs, on_update=on_update, options=options)
+    try:
+        futures = [
+            conversion_queue.submit(ConversionJob(input_file, gif_output_path(input_file, output_dir),
+                                                  start_trim, end_trim, quality))
+            for input_file in input_files
+        ]
+        return [future.result() for future in futures]
+    finally:
+        conversion_queue.shutdown()
+
+
+def job_printer():
+    """Return an on_update callback that prints each status change of a job once."""
+    printed = {}
+
+    def print_job_update(job):
+        if printed.get(job.id) == job.status:
+            return  # A progress tick, not a status change
+        printed[job.id] = job.status
+        message = f"[{job.id}] {job.status:<10} {job.input_file}"
+        if job.status == "Done":
+            message += f" -> {job.output_file}"
+        elif job.error:
+            message += f": {job.error}"
+        print(message, flush=True)
+
+    return print_job_update
+
+
+def main():
+    """Build the Tk front end; all conversion work goes through ConversionQueue."""
+    global root, input_file_var, output_file_var, video_info_var, quality_info_var
+    global start_slider, end_slider, quality_slider, job_list, progress_bar, progress_text_var
+    global jobs, job_updates, conversion_queue
+    if tk is None:
+        sys.exit("Tk is not available; use the command line: python ffmpeg_ui.py <videos...>")
+
+    # Create the main window
+    root = tk.Tk()
+    root.title("MP4 to GIF Converter")
+    root.geometry("640x780")
+
+    # Input File Selection
+    input_file_var = tk.StringVar()
+    tk.Label(root, text="Input MP4 Video:").grid(row=0, column=0, padx=10, pady=10)
+    tk.Entry(root, textvariable=input_file_var, width=50).grid(
+        row=0, column=1, padx=10, pady=10)
+    tk.Button(root, text="Browse", command=select_input_file).grid(
+        row=0, column=2, padx=10, pady=10)
+    video_info_var = tk.StringVar()
+
+    # Output File Selection
+    output_file_var = tk.StringVar()
+    tk.Label(root, text="Output GIF File:").grid(row=1, column=0, padx=10, pady=10)
+    tk.Entry(root, textvariable=output_file_var, width=50).grid(
+        row=1, column=1, padx=10, pady=10)
+    tk.Button(root, text="Browse", command=select_output_file).grid(
+        row=1, column=2, padx=10, pady=10)
+
+    # Trimming sliders
+    tk.Label(root, text="Trim Seconds from Start:").grid(
+        row=2, column=0, padx=10, pady=10)
+    start_slider = tk.Scale(root, from_=0, to=100,
+                            orient=tk.HORIZONTAL, length=300)
+    start_slider.grid(row=2, column=1, padx=10, pady=10)
+
+    tk.Label(root, text="Trim Seconds from End:").grid(
+        row=3, column=0, padx=10, pady=10)
+    end_slider = tk.Scale(root, from_=0, to=100, orient=tk.HORIZONTAL, length=300)
+    end_slider.grid(row=3, column=1, padx=10, pady=10)
+
+    # Quality slider
+    tk.Label(root, text="GIF Quality (1-5):").grid(row=4,
+                                                   column=0, padx=10, pady=10)
+    quality_slider = tk.Scale(
+        root, from_=1, to=5, orient=tk.HORIZONTAL, length=300, command=update_quality_label)
+    quality_slider.grid(row=4, column=1, padx=10, pady=10)
+    quality_info_var = tk.StringVar()
+    tk.Label(root, textvariable=quality_info_var).grid(row=4, column=2, padx=10, pady=10)
+
+    # Resolution, frame rate and codec of the selected input
+    tk.Label(root, textvariable=video_info_var).grid(row=5, column=0, padx=10)
+    update_quality_label()
+
+    # Convert button
+    tk.Button(root, text="Convert to GIF", command=trim_to_gif).grid(
+        row=5, column=1, pady=20)
+
+    # Batch queue: jobs take the trim/quality settings current when they are added
+    queue_buttons = tk.Frame(root)
+    queue_buttons.grid(row=6, column=0, columnspan=3, pady=5)
+    tk.Button(queue_buttons, text="Add Files to Queue", command=add_files_to_queue).pack(side="left", padx=5)
+    tk.Button(queue_buttons, text="Add Folder to Queue", command=add_folder_to_queue).pack(side="left", padx=5)
+    tk.Button(queue_buttons, text="Start Queue", command=start_queue).pack(side="left", padx=5)
+
+    job_list = ttk.Treeview(root, columns=("file", "trim", "quality", "status"), show="headings", height=8)
+    for column, heading, width in (("file", "File", 200), ("trim", "Trim Start / End", 110),
+                                   ("quality", "Quality", 60), ("status", "Status", 200)):
+        job_list.heading(column, text=heading)
+        job_list.column(column, width=width)
+    job_list.grid(row=7, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+
+    # Progress of the selected (or most recently active) job
+    progress_bar = ttk.Progressbar(root, maximum=100, length=300)
+    progress_bar.grid(row=8, column=1, padx=10, pady=5)
+    tk.Button(root, text="Cancel", command=cancel_selected_jobs).grid(row=8, column=2, padx=10, pady=5)
+    progress_text_var = tk.StringVar()
+    tk.Label(root, textvariable=progress_text_var).grid(row=9, column=0, columnspan=3, padx=10)
+
+    jobs = {}
+    job_updates = queue.Queue()
+    conversion_queue = ConversionQueue(on_update=job_updates.put)
+    poll_job_updates()
+
+    # Run the application
+    root.mainloop()
+    conversion_queue.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert MP4 videos to GIFs. Without inputs the Tk window is opened.")
+    parser.add_argument("inputs", nargs="*", help="Video files, directories or glob patterns to convert")
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="Folder for the GIFs (defaults to next to each video)")
+    parser.add_argument("--start", type=float, default=0, help="Seconds trimmed from the start")
+    parser.add_argument("--end", type=float, default=0, help="Seconds trimmed from the end")
+    parser.add_argument("-q", "--quality", type=int, choices=sorted(QUALITY_PRESETS), default=3,
+                        help="GIF quality (1-5)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Videos converted in parallel (defaults to the CPU count)")
+    parser.add_argument("--no-palette", action="store_true", help="Use the single-pass encode")
+    parser.add_argument("--dither", default=DEFAULT_DITHER, help="paletteuse dither mode")
+    parser.add_argument("--benchmark", metavar="VIDEO", default=None,
+                        help="Compare the single-pass and palette pipelines on one video and exit")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_palette(args.benchmark, args.start, args.end, args.quality)
+    elif args.inputs:
+        input_files = find_videos(args.inputs)
+        if not input_files:
+            sys.exit("No videos matched the given inputs.")
+        finished = convert_files(input_files, args.output_dir, args.start, args.end, args.quality,
+                                 jobs=args.jobs, on_update=job_printer(),
+                                 palette=not args.no_palette, dither=args.dither)
+        failed = [job for job in finished if job.status != "Done"]
+        print(f"{len(finished) - len(failed)} of {len(finished)} videos converted.")
+        sys.exit(1 if failed else 0)
+    else:
+        main()
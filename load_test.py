@@ -0,0 +1,199 @@
+# File: load_test.py
+# Description: Load test for simple_server.py; requests/sec and latency percentiles per serving mode
+# Date: 2024-11-19
+#
+# Starts simple_server.py once per mode on a local port, runs concurrent clients
+# against the files of the served directory for a fixed time and prints a table:
+#   python load_test.py --concurrency 32 --duration 10
+# --slow-clients opens connections that never finish their request, which stalls
+# the single mode completely while the concurrent modes keep serving.
+
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import simple_server
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple_server.py")
+REQUEST_TIMEOUT = 5
+# Files written when the served directory does not exist yet
+SAMPLE_FILES = {"index.html": 2 * 1024, "small.css": 8 * 1024, "medium.js": 64 * 1024, "large.bin": 1024 * 1024}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def write_sample_files(directory):
+    os.makedirs(directory, exist_ok=True)
+    for name, size in SAMPLE_FILES.items():
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(os.urandom(size) if name.endswith(".bin") else b"x" * size)
+
+
+def url_paths(directory, limit=50):
+    """URL paths of the files in the served directory (at most `limit`)."""
+    paths = []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            relative = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+            paths.append("/" + urllib.parse.quote(relative))
+            if len(paths) >= limit:
+                return paths
+    return paths
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def client(port, paths, offset, deadline, keep_alive, latencies, errors, revalidate=False):
+    """
+    Request the paths round-robin until the deadline, recording per-request latency.
+    With revalidate the ETag of each path is sent back, like a polling browser would.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+    etags = {}
+    number = offset
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        headers = {} if keep_alive else {"Connection": "close"}
+        if revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status not in (200, 304):
+                errors.append(response.status)
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+            if response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+    connection.close()
+
+
+def open_slow_clients(port, count):
+    """Connections that send half a request line and then go quiet."""
+    sockets = []
+    for _ in range(count):
+        try:
+            sock = socket.create_connection(("127.0.0.1", port), timeout=REQUEST_TIMEOUT)
+            sock.sendall(b"GET / HT")
+        except OSError:
+            break  # The server's backlog is full (the single mode only takes one connection at a time)
+        sockets.append(sock)
+    return sockets
+
+
+def run_mode(mode, directory, paths, concurrency, duration, keep_alive, slow_clients, workers, revalidate=False):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, "--mode", mode, "--directory", directory,
+         "--bind", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sockets = []
+    try:
+        wait_for_port(port)
+        sockets = open_slow_clients(port, slow_clients)
+        latencies, errors = [], []
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(target=client,
+                             args=(port, paths, number, deadline, keep_alive, latencies, errors, revalidate))
+            for number in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def print_results(results):
+    print(f"{'Mode':<10} {'Requests':>9} {'Errors':>7} {'Req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for result in results:
+        print(f"{result['mode']:<10} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.0f} "
+              f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure requests/sec and p99 latency of simple_server.py modes.")
+    parser.add_argument("--modes", nargs="+", choices=simple_server.SERVING_MODES,
+                        default=list(simple_server.SERVING_MODES), help="Serving modes to test")
+    parser.add_argument("--directory", default=simple_server.DIRECTORY,
+                        help="Folder to serve (sample files are used when it does not exist)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per mode")
+    parser.add_argument("--no-keepalive", action="store_true", help="Open a new connection for every request")
+    parser.add_argument("--slow-clients", type=int, default=0,
+                        help="Extra connections that never finish their request")
+    parser.add_argument("--workers", type=int, default=simple_server.WORKERS,
+                        help="Worker threads of the threaded mode")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="Send If-None-Match with the last ETag of each path (mostly 304 responses)")
+    args = parser.parse_args()
+
+    sample_dir = None
+    directory = args.directory
+    if not os.path.isdir(directory):
+        sample_dir = tempfile.mkdtemp(prefix="load_test_")
+        write_sample_files(sample_dir)
+        directory = sample_dir
+        print(f"{args.directory} not found; serving sample files from {directory}")
+    try:
+        paths = url_paths(directory)
+        if not paths:
+            sys.exit(f"No files to request in {directory}")
+        results = [run_mode(mode, directory, paths, args.concurrency, args.duration, not args.no_keepalive,
+                            args.slow_clients, args.workers, args.revalidate)
+                   for mode in args.modes]
+        print_results(results)
+    finally:
+        if sample_dir:
+            shutil.rmtree(sample_dir, ignore_errors=True)
@@ -1,21 +1,35 @@
+import argparse
+import hashlib
 import json
+import random
+import re
+import shutil
+import tempfile
+import time
 import yaml
 import os
+import pickle
 import sys
+import threading
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# C (libyaml) loader when PyYAML was built with it; several times faster than the pure-Python one
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# Parsed configs are pickled here, one file per config path, and reused while size and mtime match
+PARSED_CACHE_DIR = os.getenv('NGINX_CONFIG_CACHE_DIR',
+                             os.path.join(os.path.expanduser('~'), '.cache', 'nginx_config_gen', 'parsed'))
+PARSED_CACHE_VERSION = 1
 
 def load_config(config_path):
     if not os.path.exists(config_path):
         print(f"Configuration file '{config_path}' does not exist. Creating a new configuration.")
         return {}
     
-    with open(config_path, 'r') as f:
-        if config_path.endswith('.json'):
-            return json.load(f)
-        elif config_path.endswith(('.yaml', '.yml')):
-            return yaml.safe_load(f)
-        else:
-            print("Unsupported file format. Please provide a .json or .yaml file.")
-            sys.exit(1)
+    if not config_path.endswith(('.json', '.yaml', '.yml')):
+        print("Unsupported file format. Please provide a .json or .yaml file.")
+        sys.exit(1)
+    return read_config_file(config_path)
 
 def save_config(config, config_path):
     with open(config_path, 'w') as f:
@@ -71,6 +85,18 @@ def add_location(config):
     config['locations'].append(location)
     print("Location added.")
 
+def location_choice(config, answer):
+    # A 1-based number, or a location path such as '/api' or '= /health'
+    answer = answer.strip()
+    if answer.isdigit():
+        return int(answer)
+    paths = {' '.join(split_location(loc.get('path') or '')).strip(): idx
+             for idx, loc in enumerate(config['locations'], start=1)}
+    modifier, path = split_location(answer)
+    if f"{modifier} {path}".strip() not in paths:
+        raise ValueError(answer)
+    return paths[f"{modifier} {path}".strip()]
+
 def modify_location(config):
     if not config['locations']:
         print("No locations to modify.")
@@ -79,7 +105,7 @@ def modify_location(config):
     for idx, loc in enumerate(config['locations'], start=1):
         print(f"{idx}. Path: {loc.get('path')}, Proxy Pass: {loc.get('proxy_pass')}")
     try:
-        choice = int(input("Enter the number of the location to modify: "))
+        choice = location_choice(config, input("Enter the number or path of the location to modify: "))
         if 1 <= choice <= len(config['locations']):
             loc = config['locations'][choice - 1]
             new_path = input(f"Enter new path [{loc.get('path')}]: ").strip()
@@ -102,7 +128,7 @@ def delete_location(config):
     for idx, loc in enumerate(config['locations'], start=1):
         print(f"{idx}. Path: {loc.get('path')}, Proxy Pass: {loc.get('proxy_pass')}")
     try:
-        choice = int(input("Enter the number of the location to delete: "))
+        choice = location_choice(config, input("Enter the number or path of the location to delete: "))
         if 1 <= choice <= len(config['locations']):
             removed = config['locations'].pop(choice - 1)
             print(f"Removed location: {removed}")
@@ -111,9 +137,709 @@ def delete_location(config):
     except ValueError:
         print("Invalid input.")
 
+# Rendering: site configs (one .json/.yaml per virtual host) -> nginx server {} blocks
+# Templates use {{field}} placeholders so nginx's own braces and $variables need no escaping
+SERVER_TEMPLATE = """server {
+    listen {{listen_port}};
+    server_name {{server_name}};
+{{locations}}}
+"""
+LOCATION_TEMPLATE = """
+    location {{path}} {
+        proxy_pass {{proxy_pass}};
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+    }
+"""
+CONFIG_EXTENSIONS = ('.json', '.yaml', '.yml')
+MANIFEST_NAME = '.render_manifest.json'
+# Fewer changed sites than this are rendered in-process; a pool only pays off for bulk renders
+PARALLEL_MIN_SITES = 32
+
+TEMPLATE_FIELD = re.compile(r'\{\{(\w+)\}\}')
+
+def compile_template(text):
+    # Split the template into literal text and field names once; rendering is then a single join
+    parts = []
+    for index, piece in enumerate(TEMPLATE_FIELD.split(text)):
+        if index % 2:
+            parts.append((None, piece))
+        elif piece:
+            parts.append((piece, None))
+    def render(values):
+        return ''.join(literal if field is None else str(values[field]) for literal, field in parts)
+    return render
+
+render_server = compile_template(SERVER_TEMPLATE)
+render_location = compile_template(LOCATION_TEMPLATE)
+# Part of every input hash, so editing a template re-renders every site
+TEMPLATE_HASH = hashlib.sha256((SERVER_TEMPLATE + LOCATION_TEMPLATE).encode('utf-8')).hexdigest()
+
+def parse_config(config_path, data):
+    if config_path.endswith('.json'):
+        config = json.loads(data)
+    elif config_path.endswith(('.yaml', '.yml')):
+        config = yaml.load(data, Loader=YAML_LOADER)
+    else:
+        raise ValueError("unsupported file format, expected .json, .yaml or .yml")
+    if not isinstance(config, dict):
+        raise ValueError("expected a mapping at the top level")
+    return config
+
+def parsed_cache_path(config_path, cache_dir):
+    return os.path.join(cache_dir, hashlib.sha1(os.path.abspath(config_path).encode('utf-8')).hexdigest() + '.pickle')
+
+def config_signature(stat):
+    return (stat.st_size, stat.st_mtime_ns, PARSED_CACHE_VERSION)
+
+def cached_config(config_path, signature, cache_dir):
+    # Any unreadable entry (truncated, foreign, from another version) is a miss and gets re-parsed
+    try:
+        with open(parsed_cache_path(config_path, cache_dir), 'rb') as f:
+            cached_signature, config = pickle.load(f)
+    except Exception:
+        return None
+    return config if cached_signature == signature and isinstance(config, dict) else None
+
+def store_parsed_config(config_path, signature, config, cache_dir):
+    cache_path = parsed_cache_path(config_path, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write then rename so concurrent loaders never read a half-written entry
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump((signature, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"Warning: could not cache parsed config for '{config_path}': {e}")
+
+def read_config_file(config_path, cache_dir=PARSED_CACHE_DIR):
+    # Parsed config, from the cache when the file's size and mtime are unchanged (cache_dir=None disables it)
+    stat = os.stat(config_path)
+    signature = config_signature(stat)
+    if cache_dir:
+        config = cached_config(config_path, signature, cache_dir)
+        if config is not None:
+            return config
+    with open(config_path, 'rb') as f:
+        config = parse_config(config_path, f.read())
+    if cache_dir:
+        store_parsed_config(config_path, signature, config, cache_dir)
+    return config
+
+def parse_config_file(config_path):
+    # Runs in the worker processes of load_configs
+    try:
+        stat = os.stat(config_path)
+        with open(config_path, 'rb') as f:
+            return config_path, config_signature(stat), parse_config(config_path, f.read()), None
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        return config_path, None, None, str(e)
+
+def load_configs(config_paths, jobs=None, cache_dir=PARSED_CACHE_DIR):
+    # Load many configs at once: cache hits are read by a thread pool, misses are parsed in a
+    # process pool (in-process when there are only a few). Returns ({path: config}, [errors]).
+    configs, errors, misses = {}, [], []
+
+    def lookup(config_path):
+        try:
+            signature = config_signature(os.stat(config_path))
+        except OSError as e:
+            return config_path, None, str(e)
+        return config_path, cached_config(config_path, signature, cache_dir) if cache_dir else None, None
+
+    with ThreadPoolExecutor(max_workers=jobs or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        for config_path, config, error in pool.map(lookup, config_paths):
+            if error:
+                errors.append(f"{config_path}: {error}")
+            elif config is None:
+                misses.append(config_path)
+            else:
+                configs[config_path] = config
+
+    if len(misses) >= PARALLEL_MIN_SITES and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(parse_config_file, misses, chunksize=max(1, len(misses) // 64)))
+    else:
+        results = [parse_config_file(config_path) for config_path in misses]
+    for config_path, signature, config, error in results:
+        if error:
+            errors.append(f"{config_path}: {error}")
+            continue
+        configs[config_path] = config
+        if cache_dir:
+            store_parsed_config(config_path, signature, config, cache_dir)
+    return {path: configs[path] for path in config_paths if path in configs}, errors
+
+def render_site(config):
+    if not config.get('server_name'):
+        raise ValueError("missing server_name")
+    if not isinstance(config['server_name'], str):
+        raise ValueError(f"server_name must be a string: {config['server_name']!r}")
+    if not isinstance(config.get('listen_port', '80'), (str, int)):
+        raise ValueError(f"listen_port must be a number: {config['listen_port']!r}")
+    if not isinstance(config.get('locations') or [], list):
+        raise ValueError(f"locations must be a list of {{path, proxy_pass}} mappings: {config['locations']!r}")
+    locations = []
+    for loc in config.get('locations') or []:
+        if not isinstance(loc, dict) or not loc.get('path') or not loc.get('proxy_pass'):
+            raise ValueError(f"location needs both path and proxy_pass: {loc!r}")
+        locations.append(render_location(loc))
+    # nginx refuses to load a server block with the same location twice
+    duplicates = [f"location #{position + 1} '{path}' {detail}"
+                  for kind, position, path, detail in LocationIndex(config.get('locations') or []).issues
+                  if kind == 'duplicate']
+    if duplicates:
+        raise ValueError("duplicate locations: " + "; ".join(duplicates))
+    return render_server({
+        'listen_port': config.get('listen_port', '80'),
+        'server_name': config['server_name'],
+        'locations': ''.join(locations),
+    })
+
+def render_site_file(config_path, data, output_path):
+    # Runs in the worker processes; returns (config_path, error or None, whether the output changed).
+    # Errors are returned rather than raised, so one broken site never stops the others from rendering
+    try:
+        text = render_site(parse_config(config_path, data))
+    except (ValueError, TypeError, AttributeError, yaml.YAMLError) as e:
+        return config_path, str(e), False
+    try:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return config_path, None, False
+    except (OSError, ValueError):
+        pass
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, output_path)
+    except OSError as e:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return config_path, f"could not write {output_path}: {e}", False
+    return config_path, None, True
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, output_dir):
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    # Unique per writer, so concurrent renders into one directory never share a temp file
+    temp_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def render_configs(config_dir, output_dir, jobs=None, force=False):
+    # Render every site config in config_dir to output_dir/<name>.conf, skipping sites whose
+    # config bytes (and the templates) hash the same as last time. Returns a stats dict.
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(output_dir)
+    new_manifest = {}
+    pending = []
+    stats = {'sites': 0, 'unchanged': 0, 'rendered': 0, 'written': 0, 'removed': 0, 'errors': []}
+    names = sorted(name for name in os.listdir(config_dir) if name.endswith(CONFIG_EXTENSIONS))
+    # site.json and site.yaml would both render to site.conf: render neither rather than let one win silently
+    by_output = {}
+    for name in names:
+        by_output.setdefault(os.path.splitext(name)[0] + '.conf', []).append(name)
+    for output_name, sources in by_output.items():
+        if len(sources) > 1:
+            stats['errors'].append(f"{' and '.join(sources)} would both render to {output_name}; keep only one")
+    for name in names:
+        stats['sites'] += 1
+        config_path = os.path.join(config_dir, name)
+        output_name = os.path.splitext(name)[0] + '.conf'
+        output_path = os.path.join(output_dir, output_name)
+        if len(by_output[output_name]) > 1:
+            continue
+        try:
+            stat = os.stat(config_path)
+        except OSError as e:
+            stats['errors'].append(f"{name}: {e}")
+            continue
+        entry = manifest.get(name)
+        # Same size and mtime: trust the recorded hash without reading the file
+        if (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                and entry['template'] == TEMPLATE_HASH and os.path.exists(output_path)):
+            new_manifest[name] = entry
+            stats['unchanged'] += 1
+            continue
+        try:
+            with open(config_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            stats['errors'].append(f"{name}: {e}")
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        new_entry = {'hash': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                     'template': TEMPLATE_HASH, 'output': os.path.basename(output_path)}
+        if (entry and entry['hash'] == digest and entry['template'] == TEMPLATE_HASH
+                and os.path.exists(output_path)):
+            new_manifest[name] = new_entry
+            stats['unchanged'] += 1
+            continue
+        pending.append((config_path, data, output_path, name, new_entry))
+
+    if len(pending) >= PARALLEL_MIN_SITES and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(render_site_file, *zip(*[item[:3] for item in pending]),
+                                        chunksize=16))
+    else:
+        results = [render_site_file(*item[:3]) for item in pending]
+    for (config_path, data, output_path, name, new_entry), (_, error, written) in zip(pending, results):
+        if error:
+            stats['errors'].append(f"{name}: {error}")
+            continue
+        new_manifest[name] = new_entry
+        stats['rendered'] += 1
+        stats['written'] += written
+
+    # Outputs of site configs that were deleted (unless another config, e.g. site.yaml after site.json, now owns it)
+    for name, entry in manifest.items():
+        if (name not in new_manifest and not os.path.exists(os.path.join(config_dir, name))
+                and entry['output'] not in by_output):
+            try:
+                os.remove(os.path.join(output_dir, entry['output']))
+                stats['removed'] += 1
+            except OSError:
+                pass
+    save_manifest(new_manifest, output_dir)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+def render_main(argv):
+    parser = argparse.ArgumentParser(prog='nginx_config_gen.py render',
+                                     description="Render a directory of site configs to nginx conf files.")
+    parser.add_argument('config_dir', help="Directory of .json/.yaml site configs")
+    parser.add_argument('output_dir', help="Directory for the rendered <site>.conf files")
+    parser.add_argument('--jobs', type=int, default=None, help="Worker processes (defaults to the CPU count)")
+    parser.add_argument('--force', action='store_true', help="Ignore the manifest and render every site")
+    args = parser.parse_args(argv)
+    stats = render_configs(args.config_dir, args.output_dir, jobs=args.jobs, force=args.force)
+    print(f"{stats['sites']} sites: {stats['rendered']} rendered ({stats['written']} written), "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed in {stats['seconds'] * 1000:.1f} ms")
+    for error in stats['errors']:
+        print(f"Error: {error}")
+    if stats['errors']:
+        sys.exit(1)
+
+# Location routing: nginx picks an exact (=) match, else the longest prefix; a ^~ prefix
+# stops there, otherwise the first matching regex (~, ~*) in config order wins over the prefix
+LOCATION_MODIFIERS = ('=', '^~', '~*', '~', '@')
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+def split_location(path):
+    # '= /exact' -> ('=', '/exact'), '/api' -> ('', '/api')
+    path = path.strip()
+    for modifier in LOCATION_MODIFIERS:
+        if path.startswith(modifier) and (modifier == '@' or path[len(modifier):][:1].isspace()):
+            return modifier, path[len(modifier):].strip()
+    return '', path
+
+def has_top_level_alternation(pattern):
+    # True for '^/a|/b', where the | is outside every group and class, so ^ anchors only one branch
+    depth, in_class, i = 0, False, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 1
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == '^':
+                i += 1
+            if pattern[i + 1:i + 2] == ']':
+                i += 1  # A ] right after [ or [^ is a literal
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif char == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+def regex_literal_prefix(pattern):
+    # Literal text every match of an anchored regex starts with ('' if not anchored), and whether
+    # the regex is nothing more than that prefix, i.e. matches every URI starting with it
+    if not pattern.startswith('^') or has_top_level_alternation(pattern):
+        return '', False
+    literal = []
+    i = 1
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            char = pattern[i + 1]
+            i += 2
+        elif char in REGEX_METACHARACTERS:
+            break
+        else:
+            i += 1
+        literal.append(char)
+    rest = pattern[i:]
+    if rest[:1] in ('*', '?', '{') and literal:
+        literal.pop()  # The last character is optional
+        return ''.join(literal), False
+    return ''.join(literal), rest in ('', '.*', '.*$', '(.*)', '(.*)$', '/?.*')
+
+class TrieNode:
+    __slots__ = ('edges', 'value')
+
+    def __init__(self):
+        self.edges = {}
+        self.value = None
+
+class LocationTrie:
+    # Radix trie of location prefixes: each edge holds a run of characters, so a lookup
+    # is one walk over the URI regardless of how many locations there are
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, key, value):
+        # Returns the value previously stored under key, if any
+        node, i = self.root, 0
+        while i < len(key):
+            edge = node.edges.get(key[i])
+            if edge is None:
+                child = TrieNode()
+                node.edges[key[i]] = (key[i:], child)
+                node, i = child, len(key)
+                break
+            label, child = edge
+            common = 0
+            limit = min(len(label), len(key) - i)
+            while common < limit and label[common] == key[i + common]:
+                common += 1
+            if common < len(label):
+                middle = TrieNode()
+                middle.edges[label[common]] = (label[common:], child)
+                node.edges[key[i]] = (label[:common], middle)
+                child = middle
+            node, i = child, i + common
+        previous, node.value = node.value, value
+        return previous
+
+    def longest_prefix(self, text):
+        node, i = self.root, 0
+        best = node.value
+        while i < len(text):
+            edge = node.edges.get(text[i])
+            if edge is None or not text.startswith(edge[0], i):
+                break
+            i += len(edge[0])
+            node = edge[1]
+            if node.value is not None:
+                best = node.value
+        return best
+
+    def values_with_prefix(self, prefix):
+        node, i = self.root, 0
+        while i < len(prefix):
+            edge = node.edges.get(prefix[i])
+            if edge is None:
+                return
+            label, child = edge
+            if prefix.startswith(label, i):
+                node, i = child, i + len(label)
+            elif label.startswith(prefix[i:]):
+                node, i = child, len(prefix)
+            else:
+                return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.value is not None:
+                yield node.value
+            stack.extend(child for _, child in node.edges.values())
+
+class LocationIndex:
+    # Which location of one server block handles a URI, plus a conflict check over all of them.
+    # Entries are (position, modifier, path, location dict)
+
+    def __init__(self, locations):
+        self.exact = {}
+        self.prefixes = LocationTrie()
+        self.regexes = []
+        self.issues = []
+        if not isinstance(locations, list):
+            self.issues.append(('invalid', 0, 'locations', f"must be a list of mappings, not {locations!r}"))
+            locations = []
+        for position, loc in enumerate(locations):
+            if not isinstance(loc, dict) or not isinstance(loc.get('path') or '', str):
+                self._issue('invalid', (position, '', str(loc), None), "expected a mapping with a string path")
+                continue
+            modifier, path = split_location(loc.get('path') or '')
+            entry = (position, modifier, path, loc)
+            if modifier == '=':
+                if path in self.exact:
+                    self._issue('duplicate', entry, f"same as location #{self.exact[path][0] + 1}")
+                else:
+                    self.exact[path] = entry
+            elif modifier in ('', '^~'):
+                if not path.startswith('/'):
+                    self._issue('invalid', entry, "prefix locations must start with '/'")
+                    continue
+                previous = self.prefixes.insert(path, entry)
+                if previous is not None:
+                    self.prefixes.insert(path, previous)  # nginx rejects the second one; keep the first
+                    self._issue('duplicate', entry, f"same prefix as location #{previous[0] + 1}")
+            elif modifier in ('~', '~*'):
+                try:
+                    compiled = re.compile(path, re.IGNORECASE if modifier == '~*' else 0)
+                except re.error as e:
+                    self._issue('invalid', entry, f"bad regex: {e}")
+                    continue
+                self.regexes.append((compiled, entry))
+
+    def _issue(self, kind, entry, detail):
+        position, modifier, path, _ = entry
+        self.issues.append((kind, position, f"{modifier} {path}".strip(), detail))
+
+    def match(self, uri):
+        # The location dict that serves uri (path only, no query string), or None
+        entry = self.exact.get(uri)
+        if entry is not None:
+            return entry[3]
+        prefix = self.prefixes.longest_prefix(uri)
+        if prefix is not None and prefix[1] == '^~':
+            return prefix[3]
+        for compiled, entry in self.regexes:
+            if compiled.search(uri):
+                return entry[3]
+        return prefix[3] if prefix is not None else None
+
+    def analyze(self):
+        # Duplicates and invalid entries found while indexing, plus:
+        #   shadowed    - a prefix location whose every URI is claimed by a regex location
+        #   unreachable - a regex location that can never be the first match to win
+        issues = list(self.issues)
+        catch_all = {'': LocationTrie(), 'i': LocationTrie()}  # Prefix-only regexes seen so far
+        for compiled, entry in self.regexes:
+            position, modifier, pattern, _ = entry
+            literal, prefix_only = regex_literal_prefix(pattern)
+            if literal:
+                earlier = (catch_all['i'].longest_prefix(literal.lower())
+                           or (catch_all[''].longest_prefix(literal) if modifier == '~' else None))
+                if earlier is not None:
+                    self._add(issues, 'unreachable', entry, f"always matched first by location #{earlier[0] + 1}")
+                elif modifier == '~' or literal.lower() == literal.upper():
+                    # Prefix matching is case-sensitive: /API/x skips '^~ /api/' and can still reach
+                    # '~* ^/api/', so a ~* regex is only checked when its literal has no letters
+                    stop = self.prefixes.longest_prefix(literal)
+                    if (stop is not None and stop[1] == '^~' and not any(
+                            value[1] == '' and len(value[2]) > len(stop[2])
+                            for value in self.prefixes.values_with_prefix(literal))):
+                        self._add(issues, 'unreachable', entry,
+                                  f"its URIs all stop at ^~ location #{stop[0] + 1}")
+            if prefix_only:
+                if modifier == '~*':
+                    catch_all['i'].insert(literal.lower(), entry)
+                else:
+                    catch_all[''].insert(literal, entry)
+        for entry in self.prefixes.values_with_prefix(''):
+            position, modifier, path, _ = entry
+            if modifier == '^~':
+                continue
+            regex = catch_all[''].longest_prefix(path) or catch_all['i'].longest_prefix(path.lower())
+            if regex is not None:
+                self._add(issues, 'shadowed', entry, f"every URI is taken by regex location #{regex[0] + 1}")
+        return sorted(issues, key=lambda issue: issue[1])
+
+    @staticmethod
+    def _add(issues, kind, entry, detail):
+        position, modifier, path, _ = entry
+        issues.append((kind, position, f"{modifier} {path}".strip(), detail))
+
+def find_config_files(paths):
+    config_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            config_files += [os.path.join(path, name) for name in sorted(os.listdir(path))
+                             if name.endswith(CONFIG_EXTENSIONS)]
+        else:
+            config_files.append(path)
+    return config_files
+
+
+def check_configs(paths):
+    # Print the location issues of every config; returns the number of issues found
+    configs, errors = load_configs(find_config_files(paths))
+    for error in errors:
+        print(error)
+    total = len(errors)
+    for config_path, config in configs.items():
+        issues = LocationIndex(config.get('locations') or []).analyze()
+        for kind, position, path, detail in issues:
+            print(f"{config_path}: location #{position + 1} '{path}' {kind}: {detail}")
+        total += len(issues)
+    return total
+
+def route_urls(paths, urls):
+    # For each URL print which server block and location would handle it
+    configs, errors = load_configs(find_config_files(paths))
+    for error in errors:
+        print(error, file=sys.stderr)
+    sites = []
+    for config_path, config in configs.items():
+        names = str(config.get('server_name', '')).split()
+        sites.append((config_path, names, LocationIndex(config.get('locations') or [])))
+    for url in urls:
+        parts = urllib.parse.urlsplit(url if '://' in url or url.startswith('/') else '//' + url)
+        uri = urllib.parse.unquote(parts.path or '/')
+        host = (parts.hostname or '').lower()
+        candidates = [site for site in sites if not host or host in site[1]] or sites
+        for config_path, names, index in candidates:
+            loc = index.match(uri)
+            target = f"location '{loc['path']}' -> {loc.get('proxy_pass')}" if loc else "no matching location"
+            print(f"{url}: {os.path.basename(config_path)} ({' '.join(names)}): {target}")
+
+def synthetic_locations(count, seed=0):
+    rng = random.Random(seed)
+    locations = []
+    for i in range(count):
+        kind = rng.random()
+        base = f"/svc{i % 997}/v{i % 7}/r{i}"
+        if kind < 0.80:
+            path = base
+        elif kind < 0.90:
+            path = '^~ ' + base
+        elif kind < 0.996:
+            path = '= ' + base + '/exact'
+        else:
+            path = f"~ ^/svc{i % 997}/v{i % 7}/r{i}/.*\\.(png|css)$"
+        locations.append({'path': path, 'proxy_pass': f"http://10.{i % 250}.0.1:8080"})
+    return locations
+
+def benchmark_routing(count=50_000, lookups=100_000):
+    locations = synthetic_locations(count)
+    rng = random.Random(1)
+    uris = [f"/svc{i % 997}/v{i % 7}/r{i}/{rng.choice(['', 'x', 'img/a.png', 'exact'])}"
+            for i in (rng.randrange(count) for _ in range(lookups))]
+
+    started = time.perf_counter()
+    index = LocationIndex(locations)
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    issues = index.analyze()
+    analyze = time.perf_counter() - started
+    started = time.perf_counter()
+    for uri in uris:
+        index.match(uri)
+    lookup = time.perf_counter() - started
+    started = time.perf_counter()
+    for uri in uris:
+        index.prefixes.longest_prefix(uri)
+    prefix_lookup = time.perf_counter() - started
+
+    # Reference: scanning every prefix location for the longest match, as a flat list would
+    prefixes = [split_location(loc['path']) for loc in locations]
+    sample = uris[:200]
+    started = time.perf_counter()
+    for uri in sample:
+        max((path for modifier, path in prefixes if modifier in ('', '^~') and uri.startswith(path)),
+            key=len, default=None)
+    linear = (time.perf_counter() - started) / len(sample)
+
+    print(f"{count} locations ({len(index.regexes)} regex), {len(issues)} issues")
+    print(f"  build index    {build * 1000:9.1f} ms")
+    print(f"  analyze        {analyze * 1000:9.1f} ms")
+    print(f"  trie lookup    {lookup / lookups * 1e6:9.2f} us/URI ({lookups / lookup:,.0f}/s, incl. regex stage)")
+    print(f"  trie prefix    {prefix_lookup / lookups * 1e6:9.2f} us/URI (prefix stage only)")
+    print(f"  linear scan    {linear * 1e6:9.2f} us/URI (prefix stage only)")
+
+def benchmark_loading(sites=500, locations=200, jobs=None):
+    # Cold parse with the pure-Python and the C YAML loader, then batch loads cold and warm
+    work_dir = tempfile.mkdtemp(prefix='nginx_config_bench_')
+    try:
+        config_dir = os.path.join(work_dir, 'sites')
+        os.makedirs(config_dir)
+        paths = []
+        for i in range(sites):
+            path = os.path.join(config_dir, f"site{i}.yaml")
+            with open(path, 'w') as f:
+                yaml.dump({'server_name': f"site{i}.example.com", 'listen_port': '80',
+                           'locations': synthetic_locations(locations, seed=i)}, f, sort_keys=False)
+            paths.append(path)
+
+        def timed(label, load):
+            started = time.perf_counter()
+            load()
+            elapsed = time.perf_counter() - started
+            print(f"  {label:<28} {elapsed * 1000:9.1f} ms  ({elapsed / sites * 1000:.2f} ms/site)")
+
+        print(f"{sites} YAML configs x {locations} locations")
+
+        def parse_all(loader):
+            for path in paths:
+                with open(path, 'rb') as f:
+                    yaml.load(f.read(), Loader=loader)
+        timed('pure-Python SafeLoader', lambda: parse_all(yaml.SafeLoader))
+        if YAML_LOADER is not yaml.SafeLoader:
+            timed('C CSafeLoader', lambda: parse_all(YAML_LOADER))
+        else:
+            print("  C CSafeLoader                 not available (PyYAML built without libyaml)")
+        cache_dir = os.path.join(work_dir, 'cache')
+        timed('batch load, cold cache', lambda: load_configs(paths, jobs, cache_dir))
+        timed('batch load, warm cache', lambda: load_configs(paths, jobs, cache_dir))
+        timed('sequential, warm cache', lambda: [read_config_file(path, cache_dir) for path in paths])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def analyze_main(argv):
+    parser = argparse.ArgumentParser(prog='nginx_config_gen.py',
+                                     description="Check locations for conflicts or find the location serving a URL.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    check = subparsers.add_parser('check', help="Report duplicate, shadowed and unreachable locations")
+    check.add_argument('configs', nargs='+', help="Config files or directories of them")
+    route = subparsers.add_parser('route', help="Show which location handles each URL")
+    route.add_argument('configs', help="Config file or directory of them")
+    route.add_argument('urls', nargs='+', help="URLs or paths, e.g. site7.example.com/api/x or /api/x")
+    bench = subparsers.add_parser('bench', help="Benchmark the location index on a synthetic config")
+    bench.add_argument('--locations', type=int, default=50_000)
+    bench.add_argument('--lookups', type=int, default=100_000)
+    bench_load = subparsers.add_parser('bench-load', help="Benchmark config loading (YAML loaders and cache)")
+    bench_load.add_argument('--sites', type=int, default=500)
+    bench_load.add_argument('--locations', type=int, default=200, help="Locations per site")
+    bench_load.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.command == 'check':
+        if check_configs(args.configs):
+            sys.exit(1)
+        print("No location conflicts found.")
+    elif args.command == 'route':
+        route_urls([args.configs], args.urls)
+    elif args.command == 'bench':
+        benchmark_routing(args.locations, args.lookups)
+    else:
+        benchmark_loading(args.sites, args.locations, args.jobs)
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'render':
+        render_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] in ('check', 'route', 'bench', 'bench-load'):
+        analyze_main(sys.argv[1:])
+        return
     if len(sys.argv) != 2:
         print("Usage: python modify_nginx_config.py <path_to_config>")
+        print("       python modify_nginx_config.py render <config_dir> <output_dir> [--jobs N] [--force]")
+        print("       python modify_nginx_config.py check <config_or_dir>...")
+        print("       python modify_nginx_config.py route <config_or_dir> <url>...")
+        print("       python modify_nginx_config.py bench [--locations N]")
+        print("       python modify_nginx_config.py bench-load [--sites N] [--locations N]")
         sys.exit(1)
     
     config_path = sys.argv[1]
@@ -1,13 +1,838 @@
 # File: simple_server.py
 # Description: Static server to serve a single HTML document from a folder
 # Date: 2024-11-19
+#
+# Serving modes (--mode):
+#   single   - the original blocking TCP server; one connection at a time, HTTP/1.0
+#   threaded - requests handled by a bounded pool of worker threads (default); idle
+#              keep-alive connections wait in a selector thread, not in a worker
+#   async    - one asyncio event loop serving every connection
+# The concurrent modes speak HTTP/1.1 and keep connections alive between requests.
+# Small files are kept in an LRU memory cache; responses carry ETag, Last-Modified
+# and per-extension Cache-Control, and matching conditional requests get a 304.
+# Text-like files are sent gzip/brotli-encoded when the client accepts it: from a
+# precompressed .gz/.br sibling if present, else compressed once and cached.
+# `python simple_server.py --precompress` writes those siblings for the whole tree.
+# Files are sent with sendfile, and Range/If-Range requests get 206 partial content.
+# GET /__metrics returns per-path request counts, bytes and latency histograms
+# (p50/p95/p99) in the Prometheus text format; the access log is written by a
+# background thread so logging never blocks a request.
+# load_test.py measures requests/sec and latency of each mode.
 
+import argparse
+import asyncio
+import atexit
+import email.utils
+import gzip
+import hashlib
+import html
 import http.server
-import socketserver
+import io
+import mimetypes
+import os
+import posixpath
+import selectors
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import queue
+import threading
+import time
+import urllib.parse
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from stat import S_ISREG
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: .br siblings are still served, just not produced
+    brotli = None
 
 # Configuration
 PORT = 5551
 DIRECTORY = "static"
+SERVING_MODES = ("single", "threaded", "async")
+# Worker threads of the threaded mode; a worker is only taken while a request is being answered
+WORKERS = 32
+LISTEN_BACKLOG = 128
+# Open connections of the threaded mode; further ones wait in the listen backlog
+MAX_CONNECTIONS = 1024
+# Seconds an idle keep-alive connection is held open before it is closed (also the send timeout)
+KEEPALIVE_TIMEOUT = 15
+# Limits on the request head read by the asyncio server
+MAX_LINE_BYTES = 65536
+MAX_HEADERS = 100
+INDEX_FILES = ("index.html", "index.htm")
+# In-memory file cache: total size cap and the largest file kept in memory
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_FILE_BYTES = 1024 * 1024
+# parse_range result for a Range that starts past the end of the file
+RANGE_NOT_SATISFIABLE = "unsatisfiable"
+# Content negotiation: encodings in server preference order and their sibling-file suffixes
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "application/xml", "application/wasm",
+    "application/manifest+json", "application/x-javascript", "image/svg+xml", "image/x-icon",
+    "font/ttf", "font/otf",
+}
+# Files compressed on the fly (and by --precompress) must be at least this large
+COMPRESS_MIN_BYTES = 512
+# Larger files are only sent compressed when a precompressed sibling exists
+COMPRESS_MAX_BYTES = 8 * 1024 * 1024
+# Compressed variants too large for the file cache are written here once and sent with sendfile
+# (default: a temporary directory removed on exit)
+COMPRESSED_DIR = None
+# Instrumentation: Prometheus endpoint, latency histogram buckets (seconds) and label cap
+METRICS_ENDPOINT = "/__metrics"
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+METRICS_MAX_PATHS = 1000
+OTHER_PATHS_LABEL = "__other__"
+# Access log lines waiting for the writer thread; beyond this they are dropped
+ACCESS_LOG_QUEUE = 10000
+ACCESS_LOG_BATCH = 500
+ACCESS_LOG_FLUSH_SECONDS = 0.5
+# Cache-Control per file extension (override with --cache-control EXT=VALUE)
+DEFAULT_CACHE_CONTROL = "no-cache"
+CACHE_CONTROL = {
+    ".html": "no-cache",
+    ".htm": "no-cache",
+    ".css": "public, max-age=3600",
+    ".js": "public, max-age=3600",
+    ".json": "no-cache",
+    ".png": "public, max-age=86400",
+    ".jpg": "public, max-age=86400",
+    ".jpeg": "public, max-age=86400",
+    ".gif": "public, max-age=86400",
+    ".svg": "public, max-age=86400",
+    ".ico": "public, max-age=86400",
+    ".woff2": "public, max-age=604800",
+}
+
+
+class StaticResponse:
+    """
+    Status, headers and body of a response, produced once and written by every
+    serving mode. The body is either bytes or `length` bytes of an open file
+    starting at `offset`, which the servers hand to sendfile.
+    """
+
+    def __init__(self, status, headers=None, body=b"", file=None, length=None, offset=0):
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+        self.file = file
+        self.offset = offset
+        self.length = len(body) if length is None else length
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def translate_path(directory, url_path):
+    """Map a URL path onto the served directory, ignoring '..' and other escapes (as http.server does)."""
+    path = url_path.split("?", 1)[0].split("#", 1)[0]
+    trailing_slash = path.rstrip().endswith("/")
+    path = posixpath.normpath(urllib.parse.unquote(path, errors="surrogatepass"))
+    result = directory
+    for word in filter(None, path.split("/")):
+        if os.path.dirname(word) or word in (os.curdir, os.pardir):
+            continue
+        result = os.path.join(result, word)
+    if trailing_slash:
+        result += "/"
+    return result
+
+
+def error_response(status, message=None):
+    status = HTTPStatus(status)
+    body = (f"<!DOCTYPE html><html><head><title>{status.value} {status.phrase}</title></head>"
+            f"<body><h1>{status.value} {html.escape(message or status.phrase)}</h1></body></html>").encode()
+    return StaticResponse(status, [("Content-Type", "text/html;charset=utf-8"),
+                                   ("Content-Length", str(len(body)))], body)
+
+
+def directory_listing(path, url_path):
+    """HTML listing of a directory without an index file."""
+    try:
+        names = sorted(os.listdir(path), key=str.lower)
+    except OSError:
+        return error_response(HTTPStatus.NOT_FOUND, "No permission to list directory")
+    title = html.escape(urllib.parse.unquote(url_path.split("?", 1)[0]))
+    lines = [f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Directory listing for {title}</title>"
+             f"</head><body><h1>Directory listing for {title}</h1><hr><ul>"]
+    for name in names:
+        link = name + "/" if os.path.isdir(os.path.join(path, name)) else name
+        lines.append(f"<li><a href=\"{urllib.parse.quote(link)}\">{html.escape(link)}</a></li>")
+    lines.append("</ul><hr></body></html>")
+    body = "\n".join(lines).encode("utf-8")
+    return StaticResponse(HTTPStatus.OK, [("Content-Type", "text/html; charset=utf-8"),
+                                          ("Content-Length", str(len(body)))], body)
+
+
+class CachedFile:
+    """
+    Bytes derived from one file (its contents or a compressed variant), valid while
+    the file's mtime and size are unchanged. data=None records that there is nothing
+    worth keeping, e.g. a variant that did not compress, unless `path` names a file
+    on disk holding a variant too large to keep in memory.
+    """
+
+    __slots__ = ("data", "mtime_ns", "size", "path")
+
+    def __init__(self, data, mtime_ns, size, path=None):
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.path = path
+
+    @property
+    def nbytes(self):
+        return len(self.data) if self.data is not None else 0
+
+
+class FileCache:
+    """
+    LRU cache of small files capped at max_bytes in total. Keys are paths, or
+    (path, encoding) for compressed variants. Entries are checked against a fresh
+    stat of the file on every lookup, so an edited file is re-read at once.
+    Shared by the worker threads of the threaded mode.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_file_bytes=CACHE_MAX_FILE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, stat):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, entry):
+        if entry.nbytes > self.max_file_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.nbytes
+                self._discard(old, entry)
+            self._entries[key] = entry
+            self.size += entry.nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.nbytes
+                self._discard(evicted)
+
+    @staticmethod
+    def _discard(entry, replacement=None):
+        """Remove the file an entry spilled to disk (responses already sending it keep it open)."""
+        if entry.path and (replacement is None or replacement.path != entry.path):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+file_cache = FileCache()
+
+
+def make_etag(stat, encoding=None):
+    """
+    Strong validator from the file's mtime and size; cheap enough to compute for files
+    never read. Every content encoding is a different representation with its own tag.
+    """
+    suffix = f"-{encoding}" if encoding else ""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def guess_content_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    if encoding == "gzip":
+        return "application/gzip"  # A .gz file requested by name is sent as it is
+    if encoding:
+        return "application/octet-stream"
+    return content_type or "application/octet-stream"
+
+
+def is_compressible(content_type):
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def acceptable_encodings(accept_encoding):
+    """Encodings from ENCODING_SUFFIXES the client accepts, best first (by q-value, then our preference)."""
+    if not accept_encoding:
+        return []
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.strip().lower().split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip()] = quality
+    ranked = [(qualities.get(encoding, qualities.get("*", 0.0)), encoding) for encoding in ENCODING_SUFFIXES]
+    return [encoding for quality, encoding in sorted(ranked, key=lambda item: -item[0]) if quality > 0]
+
+
+def compress(data, encoding, level=None):
+    """gzip or brotli-compress data; level defaults to a fast setting suited to on-the-fly use."""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level or 6, mtime=0)
+    return brotli.compress(data, quality=level or 5)
+
+
+def can_compress(encoding):
+    return encoding == "gzip" or (encoding == "br" and brotli is not None)
+
+
+compressing_locks = defaultdict(threading.Lock)
+compressing_locks_lock = threading.Lock()
+
+
+def compressed_dir():
+    global COMPRESSED_DIR
+    with compressing_locks_lock:
+        if COMPRESSED_DIR is None:
+            COMPRESSED_DIR = tempfile.mkdtemp(prefix="simple_server_")
+            atexit.register(shutil.rmtree, COMPRESSED_DIR, ignore_errors=True)
+        return COMPRESSED_DIR
+
+
+def spill_compressed(path, stat, encoding, compressed):
+    """Write a compressed variant too large for the cache to disk; None if it cannot be written."""
+    digest = hashlib.sha1(os.fsencode(path)).hexdigest()[:16]
+    name = f"{digest}-{stat.st_mtime_ns:x}-{stat.st_size:x}{ENCODING_SUFFIXES[encoding]}"
+    spill_path = os.path.join(compressed_dir(), name)
+    temp_file = f"{spill_path}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(compressed)
+        os.replace(temp_file, spill_path)
+    except OSError:
+        return None
+    return spill_path
+
+
+def compressed_variant(path, stat, encoding, cache):
+    """
+    Compress a file once per (mtime, size) and encoding. Returns a CachedFile holding the
+    bytes, or for a variant larger than the cache's per-file cap the file it was written
+    to; None if it does not get smaller. Concurrent requests for the same variant wait for
+    the first one instead of compressing it again.
+    """
+    key = (path, encoding)
+    entry = cache.get(key, stat) if cache else None
+    if entry is not None:
+        return entry
+    with compressing_locks_lock:
+        lock = compressing_locks[key]
+    with lock:
+        entry = cache.get(key, stat) if cache else None
+        if entry is not None:
+            return entry
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != stat.st_size:
+            return None  # Changed while we read it
+        compressed = compress(data, encoding)
+        if len(compressed) >= len(data):
+            entry = CachedFile(None, stat.st_mtime_ns, stat.st_size)  # Remembered, so it is not compressed again
+        elif cache and len(compressed) > cache.max_file_bytes:
+            spill_path = spill_compressed(path, stat, encoding, compressed)
+            if spill_path is None:
+                return CachedFile(compressed, stat.st_mtime_ns, stat.st_size)
+            entry = CachedFile(None, stat.st_mtime_ns, stat.st_size, spill_path)
+        else:
+            entry = CachedFile(compressed, stat.st_mtime_ns, stat.st_size)
+        if cache:
+            cache.put(key, entry)
+        return entry
+
+
+def select_encoding(path, stat, accept_encoding, cache):
+    """
+    Pick the representation to send: (encoding, body path, body stat, body bytes or None),
+    or None for the file as it is. A precompressed sibling (app.js.gz, app.js.br) is used
+    when it is at least as new as the file; otherwise the file is compressed and cached.
+    """
+    for encoding in acceptable_encodings(accept_encoding):
+        sibling = path + ENCODING_SUFFIXES[encoding]
+        try:
+            sibling_stat = os.stat(sibling)
+        except OSError:
+            sibling_stat = None
+        if sibling_stat and S_ISREG(sibling_stat.st_mode) and sibling_stat.st_mtime_ns >= stat.st_mtime_ns:
+            return encoding, sibling, sibling_stat, None
+        if can_compress(encoding) and COMPRESS_MIN_BYTES <= stat.st_size <= COMPRESS_MAX_BYTES:
+            entry = compressed_variant(path, stat, encoding, cache)
+            if entry is not None and entry.data is not None:
+                return encoding, path, stat, entry.data
+            if entry is not None and entry.path:
+                try:
+                    return encoding, entry.path, os.stat(entry.path), None
+                except OSError:
+                    pass  # Removed under us (the entry was just replaced); fall back to the next encoding
+    return None
+
+
+def cache_control_for(path):
+    return CACHE_CONTROL.get(os.path.splitext(path)[1].lower(), DEFAULT_CACHE_CONTROL)
+
+
+def not_modified(headers, etag, mtime):
+    """True when the request's If-None-Match (or, without it, If-Modified-Since) validates our copy."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError, IndexError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
+
+
+def parse_range(range_header, size):
+    """
+    Return (start, end), both inclusive, for a single byte range of a file of `size` bytes,
+    RANGE_NOT_SATISFIABLE for a range past its end, or None to send the whole file
+    (no header, bad syntax or several ranges, which we do not combine into multipart).
+    """
+    if not range_header or not range_header.strip().lower().startswith("bytes="):
+        return None
+    specs = range_header.strip()[6:].split(",")
+    if len(specs) != 1:
+        return None
+    first, separator, last = specs[0].strip().partition("-")
+    if not separator or not (first or last) or not (first + last).isdigit():
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return RANGE_NOT_SATISFIABLE
+        start, end = max(0, size - suffix), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    if start >= size:
+        return RANGE_NOT_SATISFIABLE
+    return start, end
+
+
+def if_range_matches(if_range, etag, mtime):
+    """True when a Range may be honoured: no If-Range, or one naming our current ETag or Last-Modified."""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(("\"", "W/")):
+        return if_range == etag  # Strong comparison; weak tags never match
+    try:
+        since = email.utils.parsedate_to_datetime(if_range)
+    except (TypeError, ValueError, IndexError):
+        return False
+    return since.tzinfo is not None and int(mtime) == since.timestamp()
+
+
+def static_response(directory, method, url_path, headers, cache=file_cache):
+    """
+    Build the response to a GET or HEAD request for a file under directory.
+    headers is any mapping with a case-insensitive (or lower-case keyed) get().
+    Small files are answered from cache (pass cache=None to always read from disk),
+    text-like files are compressed as Accept-Encoding allows and conditional
+    requests that still match get a 304.
+    """
+    if method not in ("GET", "HEAD"):
+        return error_response(HTTPStatus.NOT_IMPLEMENTED, f"Unsupported method ({method})")
+    path = translate_path(directory, url_path)
+    if os.path.isdir(path):
+        parts = urllib.parse.urlsplit(url_path)
+        if not parts.path.endswith("/"):
+            location = urllib.parse.urlunsplit((parts[0], parts[1], parts[2] + "/", parts[3], parts[4]))
+            return StaticResponse(HTTPStatus.MOVED_PERMANENTLY, [("Location", location), ("Content-Length", "0")])
+        for index in INDEX_FILES:
+            if os.path.isfile(os.path.join(path, index)):
+                path = os.path.join(path, index)
+                break
+        else:
+            return directory_listing(path, url_path)
+    if path.endswith("/"):
+        return error_response(HTTPStatus.NOT_FOUND, "File not found")
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return error_response(HTTPStatus.NOT_FOUND, "File not found")
+    if not S_ISREG(stat.st_mode):
+        return error_response(HTTPStatus.NOT_FOUND, "File not found")
+
+    content_type = guess_content_type(path)
+    compressible = is_compressible(content_type)
+    encoding, body_path, body_stat, data = None, path, stat, None
+    if compressible:
+        variant = select_encoding(path, stat, headers.get("accept-encoding"), cache)
+        if variant:
+            encoding, body_path, body_stat, data = variant
+
+    etag = make_etag(stat, encoding)
+    validators = [
+        ("ETag", etag),
+        ("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True)),
+        ("Cache-Control", cache_control_for(path)),
+    ]
+    if compressible:
+        validators.append(("Vary", "Accept-Encoding"))
+    if not_modified(headers, etag, stat.st_mtime):
+        return StaticResponse(HTTPStatus.NOT_MODIFIED, validators)
+
+    length = len(data) if data is not None else body_stat.st_size
+    response_headers = [("Content-Type", content_type)]
+    if encoding:
+        response_headers.append(("Content-Encoding", encoding))
+    else:
+        # Ranges are offered on the file as stored; compressed variants are always sent whole
+        response_headers.append(("Accept-Ranges", "bytes"))
+    response_headers += validators
+
+    byte_range = None
+    if method == "GET" and not encoding and if_range_matches(headers.get("if-range"), etag, stat.st_mtime):
+        byte_range = parse_range(headers.get("range"), length)
+    if byte_range == RANGE_NOT_SATISFIABLE:
+        response = error_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        response.headers.append(("Content-Range", f"bytes */{length}"))
+        return response
+    if byte_range:
+        start, end = byte_range
+        status = HTTPStatus.PARTIAL_CONTENT
+        response_headers += [("Content-Range", f"bytes {start}-{end}/{length}"),
+                             ("Content-Length", str(end - start + 1))]
+    else:
+        start, end = 0, length - 1
+        status = HTTPStatus.OK
+        response_headers.append(("Content-Length", str(length)))
+
+    if method == "HEAD":
+        return StaticResponse(status, response_headers, length=length)
+    if data is not None:
+        return StaticResponse(status, response_headers, memoryview(data)[start:end + 1])
+    return file_response(body_path, body_stat, response_headers, cache, status, start, end)
+
+
+def file_response(path, stat, response_headers, cache, status=HTTPStatus.OK, start=0, end=None):
+    """
+    Send bytes start..end of a file: from the cache, by reading (and caching) a small file,
+    or, for a large one, as an open file for the server to sendfile from disk.
+    """
+    end = stat.st_size - 1 if end is None else end
+    entry = cache.get(path, stat) if cache and stat.st_size <= cache.max_file_bytes else None
+    if entry is not None:
+        return StaticResponse(status, response_headers, memoryview(entry.data)[start:end + 1])
+    try:
+        file = open(path, "rb")
+    except OSError:
+        return error_response(HTTPStatus.NOT_FOUND, "File not found")
+    if not cache or stat.st_size > cache.max_file_bytes:
+        return StaticResponse(status, response_headers, file=file, offset=start, length=end - start + 1)
+    with file:
+        data = file.read()
+    if len(data) != stat.st_size:
+        # Changed while we read it; send it whole, without caching it
+        response_headers = [(name, value) for name, value in response_headers
+                            if name not in ("Content-Length", "Content-Range")]
+        return StaticResponse(HTTPStatus.OK, response_headers + [("Content-Length", str(len(data)))], data)
+    cache.put(path, CachedFile(data, stat.st_mtime_ns, stat.st_size))
+    return StaticResponse(status, response_headers, memoryview(data)[start:end + 1])
+
+
+def precompress_file(path, encodings):
+    """
+    Write compressed siblings of one file at the highest level, skipping ones that are
+    up to date or would not be smaller. Returns (path, original size, {encoding: size}).
+    """
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    written = {}
+    for encoding in encodings:
+        sibling = path + ENCODING_SUFFIXES[encoding]
+        try:
+            if os.stat(sibling).st_mtime_ns == stat.st_mtime_ns:
+                written[encoding] = os.path.getsize(sibling)
+                continue
+        except OSError:
+            pass
+        compressed = compress(data, encoding, level=9 if encoding == "gzip" else 11)
+        if len(compressed) >= len(data):
+            continue
+        temp_file = f"{sibling}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as f:
+            f.write(compressed)
+        # Same mtime as the source: the server only trusts siblings at least as new as the file
+        os.utime(temp_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(temp_file, sibling)
+        written[encoding] = len(compressed)
+    return path, stat.st_size, written
+
+
+def precompress_tree(directory, jobs=None, min_bytes=COMPRESS_MIN_BYTES):
+    """Precompress every compressible file under directory on a process pool and print a summary."""
+    encodings = [encoding for encoding in ENCODING_SUFFIXES if can_compress(encoding)]
+    suffixes = tuple(ENCODING_SUFFIXES.values())
+    paths = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if (not name.endswith(suffixes) and is_compressible(guess_content_type(path))
+                    and os.path.getsize(path) >= min_bytes):
+                paths.append(path)
+    totals = {"original": 0, **{encoding: 0 for encoding in encodings}}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for path, size, written in executor.map(precompress_file, paths, [encodings] * len(paths), chunksize=8):
+            totals["original"] += size
+            for encoding in encodings:
+                totals[encoding] += written.get(encoding, size)
+    print(f"Precompressed {len(paths)} files ({totals['original'] / 1024:.0f} KiB) in {directory}")
+    for encoding in encodings:
+        saved = 1 - totals[encoding] / totals["original"] if totals["original"] else 0
+        print(f"  {encoding:<5} {totals[encoding] / 1024:>10.0f} KiB  ({saved:.0%} smaller)")
+    if brotli is None:
+        print("  (install brotli to also write .br files)")
+    return totals
+
+
+class RequestMetrics:
+    """
+    Per-path request counts (by status), bytes sent and latency histograms,
+    rendered in the Prometheus text format. observe() is cheap and thread-safe.
+    Paths beyond max_paths are counted under OTHER_PATHS_LABEL.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, max_paths=METRICS_MAX_PATHS):
+        self.buckets = buckets
+        self.max_paths = max_paths
+        self.started = time.time()
+        self._requests = defaultdict(int)  # (path, status) -> count
+        self._bytes = defaultdict(int)  # path -> bytes
+        self._latency = {}  # path -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, path, status, sent_bytes, seconds):
+        with self._lock:
+            if path not in self._latency:
+                if len(self._latency) >= self.max_paths:
+                    path = OTHER_PATHS_LABEL
+                if path not in self._latency:
+                    self._latency[path] = [0] * (len(self.buckets) + 2)
+            self._requests[(path, int(status))] += 1
+            self._bytes[path] += sent_bytes
+            histogram = self._latency[path]
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-1] += seconds
+
+    def quantile(self, histogram, q):
+        """Estimate a quantile from bucket counts, interpolating inside the bucket (like histogram_quantile)."""
+        counts = histogram[:-1]
+        total = sum(counts)
+        if not total:
+            return float("nan")
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self, cache=None):
+        with self._lock:
+            requests = sorted(self._requests.items())
+            sent = sorted(self._bytes.items())
+            latency = sorted((path, list(histogram)) for path, histogram in self._latency.items())
+        lines = [
+            "# HELP simple_server_requests_total Requests served, by path and status.",
+            "# TYPE simple_server_requests_total counter",
+        ]
+        lines += [f'simple_server_requests_total{{path="{_label(path)}",status="{status}"}} {count}'
+                  for (path, status), count in requests]
+        lines += [
+            "# HELP simple_server_response_bytes_total Body bytes sent, by path.",
+            "# TYPE simple_server_response_bytes_total counter",
+        ]
+        lines += [f'simple_server_response_bytes_total{{path="{_label(path)}"}} {count}' for path, count in sent]
+        lines += [
+            "# HELP simple_server_request_duration_seconds Time to build and send a response, by path.",
+            "# TYPE simple_server_request_duration_seconds histogram",
+        ]
+        for path, histogram in latency:
+            cumulative = 0
+            label = _label(path)
+            for bound, count in zip(self.buckets + (float("inf"),), histogram[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'simple_server_request_duration_seconds_bucket{{path="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'simple_server_request_duration_seconds_sum{{path="{label}"}} {histogram[-1]:.6f}')
+            lines.append(f'simple_server_request_duration_seconds_count{{path="{label}"}} {cumulative}')
+        lines += [
+            "# HELP simple_server_request_latency_seconds Latency quantiles estimated from the histogram, by path.",
+            "# TYPE simple_server_request_latency_seconds summary",
+        ]
+        for path, histogram in latency:
+            label = _label(path)
+            for q in LATENCY_QUANTILES:
+                lines.append(f'simple_server_request_latency_seconds{{path="{label}",quantile="{q}"}} '
+                             f'{self.quantile(histogram, q):.6f}')
+            lines.append(f'simple_server_request_latency_seconds_sum{{path="{label}"}} {histogram[-1]:.6f}')
+            lines.append(f'simple_server_request_latency_seconds_count{{path="{label}"}} {sum(histogram[:-1])}')
+        if cache is not None:
+            lines += [
+                "# TYPE simple_server_cache_hits_total counter",
+                f"simple_server_cache_hits_total {cache.hits}",
+                "# TYPE simple_server_cache_misses_total counter",
+                f"simple_server_cache_misses_total {cache.misses}",
+                "# TYPE simple_server_cache_bytes gauge",
+                f"simple_server_cache_bytes {cache.size}",
+            ]
+        lines += [
+            "# TYPE simple_server_access_log_dropped_total counter",
+            f"simple_server_access_log_dropped_total {access_log.dropped}",
+            "# TYPE simple_server_start_time_seconds gauge",
+            f"simple_server_start_time_seconds {self.started:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class AccessLog:
+    """
+    Access log that never blocks a request: lines are queued and a background
+    thread writes them in batches. When the queue is full lines are dropped
+    (and counted) rather than slowing the server down.
+    """
+
+    def __init__(self, max_queued=ACCESS_LOG_QUEUE, flush_interval=ACCESS_LOG_FLUSH_SECONDS):
+        self.stream = None
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._writer = None
+
+    def open(self, stream):
+        """Start writing to stream (a text file); until then, and with stream=None, lines are discarded."""
+        self.stream = stream
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="access-log", daemon=True)
+            self._writer.start()
+
+    def request(self, client, request_line, status, sent_bytes, seconds):
+        if self.stream is None:
+            return
+        try:
+            self._queue.put_nowait((time.time(), client, request_line, int(status), sent_bytes, seconds))
+        except queue.Full:
+            self.dropped += 1
+
+    def message(self, client, text):
+        self.request(client, text, 0, 0, None)
+
+    def close(self, timeout=5):
+        """Write out every queued line and flush the stream; lines logged afterwards are discarded."""
+        if self._writer is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)  # Waits while the queue is full; the writer is draining it
+        except queue.Full:
+            return
+        self._writer.join(timeout)
+        self._writer = None
+        self.stream = None
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            try:
+                records = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(records) < ACCESS_LOG_BATCH:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in records:
+                # close() was called: what was queued before it is the last batch
+                stopping = True
+                records = records[:records.index(None)]
+            lines = [self._format(*record) for record in records]
+            try:
+                self.stream.write("".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                self.dropped += len(lines)
+
+    @staticmethod
+    def _format(timestamp, client, request_line, status, sent_bytes, seconds):
+        when = time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(timestamp))
+        if seconds is None:
+            return f"{client} - - [{when}] {request_line}\n"
+        return f'{client} - - [{when}] "{request_line}" {status} {sent_bytes} {seconds * 1000:.2f}ms\n'
+
+
+request_metrics = RequestMetrics()
+access_log = AccessLog()
+
+
+def respond(directory, method, url_path, headers):
+    """Answer the metrics endpoint, or a static file request."""
+    if method == "GET" and urllib.parse.urlsplit(url_path).path == METRICS_ENDPOINT:
+        body = request_metrics.render(file_cache).encode("utf-8")
+        return StaticResponse(HTTPStatus.OK, [("Content-Type", "text/plain; version=0.0.4; charset=utf-8"),
+                                              ("Content-Length", str(len(body))),
+                                              ("Cache-Control", "no-store")], body)
+    return static_response(directory, method, url_path, headers)
+
+
+def record_request(client, request_line, url_path, status, sent_bytes, started):
+    seconds = time.perf_counter() - started
+    request_metrics.observe(urllib.parse.urlsplit(url_path).path, status, sent_bytes, seconds)
+    access_log.request(client, request_line, status, sent_bytes, seconds)
 
 
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
@@ -15,12 +840,395 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     Custom HTTP request handler to serve files from a specific directory
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIRECTORY, **kwargs)
+    protocol_version = "HTTP/1.1"
+    # Writes to a client that stopped reading give up after this many seconds
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body go out in separate writes; Nagle would hold the body back for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def __init__(self, *args, directory=None, **kwargs):
+        super().__init__(*args, directory=directory or DIRECTORY, **kwargs)
+
+    def handle(self):
+        # One request per call: between requests PooledHTTPServer parks the connection, not the thread
+        self.close_connection = True
+        self.handle_one_request()
+
+    def do_GET(self):
+        self.send_static()
+
+    def do_HEAD(self):
+        self.send_static()
+
+    def send_static(self):
+        started = time.perf_counter()
+        response = respond(self.directory, self.command, self.path, self.headers)
+        sent = 0
+        if not wants_keep_alive(self.command, self.request_version,
+                                {name.lower(): value for name, value in self.headers.items()}):
+            self.close_connection = True
+        try:
+            # send_response without its synchronous log line; the request is logged once it is done
+            self.send_response_only(response.status)
+            self.send_header("Server", self.version_string())
+            self.send_header("Date", self.date_time_string())
+            if self.close_connection and self.protocol_version == "HTTP/1.1":
+                # Tell the client, so it does not send its next request into a closed socket
+                self.send_header("Connection", "close")
+            for name, value in response.headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command == "HEAD":
+                return
+            if response.file:
+                # socket.sendfile uses os.sendfile: the kernel copies straight from the page cache
+                sent = self.connection.sendfile(response.file, response.offset, response.length)
+            elif response.body:
+                self.wfile.write(response.body)
+                sent = len(response.body)
+        finally:
+            response.close()
+            record_request(self.client_address[0], self.requestline, self.path, response.status, sent, started)
+
+    def log_message(self, format, *args):
+        # Errors and requests rejected by http.server go to the buffered access log, not stderr
+        access_log.message(self.address_string(), format % args)
+
+
+class SingleConnectionRequestHandler(CustomHTTPRequestHandler):
+    """HTTP/1.0 handler for the single mode, where a kept-alive client would block everyone else."""
+
+    protocol_version = "HTTP/1.0"
+    timeout = None
+
+
+class BufferedRequest:
+    """A client socket whose next request head has already been read by IdleConnections."""
+
+    def __init__(self, sock, head):
+        self._sock = sock
+        self.head = head
+
+    def makefile(self, mode="r", *args, **kwargs):
+        if "r" in mode:
+            return io.BytesIO(self.head)
+        return self._sock.makefile(mode, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def request_head_end(buffer):
+    """Offset just past the blank line ending a request head, or -1 if it is not complete yet."""
+    ends = [index + len(marker) for marker in (b"\r\n\r\n", b"\n\n")
+            for index in (buffer.find(marker),) if index != -1]
+    return min(ends) if ends else -1
+
+
+class IdleConnections:
+    """
+    The open connections of the threaded mode that are waiting for their next
+    request. One selector thread reads them without blocking; once a complete
+    request head has arrived the connection goes to the worker pool, so idle
+    keep-alive and slow clients never hold a worker thread.
+    """
+
+    def __init__(self, server, timeout=KEEPALIVE_TIMEOUT):
+        self.server = server
+        self.timeout = timeout
+        self.selector = selectors.DefaultSelector()
+        self.incoming = queue.SimpleQueue()
+        self._wakeup_receiver, self._wakeup_sender = socket.socketpair()
+        self._wakeup_receiver.setblocking(False)
+        self.selector.register(self._wakeup_receiver, selectors.EVENT_READ)
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="http-idle", daemon=True)
+        self.thread.start()
+
+    def park(self, sock, client_address, buffered=b""):
+        """Wait for the next request on a connection (thread-safe)."""
+        self.incoming.put((sock, client_address, buffered))
+        try:
+            self._wakeup_sender.send(b"\0")
+        except OSError:
+            pass  # Wakeup buffer full: the selector thread is awake anyway
+
+    def close(self):
+        self.closed = True
+        self.park(None, None)
+        self.thread.join()
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self.server.close_connection(key.fileobj)
+        self.selector.close()
+        self._wakeup_receiver.close()
+        self._wakeup_sender.close()
+
+    def _run(self):
+        next_expiry = time.monotonic() + 1
+        while not self.closed:
+            events = self.selector.select(timeout=1)
+            now = time.monotonic()
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while self._wakeup_receiver.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self._read(key.fileobj, key.data, now)
+            while True:
+                try:
+                    sock, client_address, buffered = self.incoming.get_nowait()
+                except queue.Empty:
+                    break
+                if sock is not None:
+                    self._add(sock, client_address, bytearray(buffered), now)
+            if now >= next_expiry:
+                next_expiry = now + 1
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None and now - key.data[2] > self.timeout:
+                        self.selector.unregister(key.fileobj)
+                        self.server.close_connection(key.fileobj)
+
+    def _add(self, sock, client_address, buffer, now):
+        if not self._dispatch(sock, client_address, buffer):
+            # [client address, bytes read so far, last activity]
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, [client_address, buffer, now])
+
+    def _read(self, sock, state, now):
+        try:
+            data = sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.selector.unregister(sock)
+            self.server.close_connection(sock)
+            return
+        state[1] += data
+        state[2] = now
+        if request_head_end(state[1]) != -1:
+            self.selector.unregister(sock)
+            self._dispatch(sock, state[0], state[1])
+        elif len(state[1]) > MAX_LINE_BYTES + MAX_HEADERS * 1024:
+            self.selector.unregister(sock)
+            try:
+                sock.send(b"HTTP/1.1 431 Request Header Fields Too Large\r\nConnection: close\r\n"
+                          b"Content-Length: 0\r\n\r\n")
+            except OSError:
+                pass
+            self.server.close_connection(sock)
+
+    def _dispatch(self, sock, client_address, buffer):
+        # Blank lines between pipelined requests are allowed and skipped
+        del buffer[:len(buffer) - len(buffer.lstrip(b"\r\n"))]
+        end = request_head_end(buffer)
+        if end == -1:
+            return False
+        self.server.dispatch(sock, client_address, bytes(buffer[:end]), bytes(buffer[end:]))
+        return True
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """
+    HTTPServer whose requests are answered by a fixed pool of worker threads.
+    Connections wait for their next request in IdleConnections and only take
+    a worker while a request is being answered. Beyond max_connections open
+    connections the accept loop waits, so further load queues in the listen
+    backlog instead of growing without bound.
+    """
+
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, server_address, handler_class, workers=WORKERS, max_connections=MAX_CONNECTIONS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-worker")
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+        self.idle = IdleConnections(self)
+
+    def process_request(self, request, client_address):
+        # A new connection waits for its first request like an idle kept-alive one
+        self.connection_slots.acquire()
+        self.idle.park(request, client_address)
+
+    def dispatch(self, request, client_address, head, rest):
+        try:
+            self.pool.submit(self._process_request, request, client_address, head, rest)
+        except RuntimeError:  # Pool already shut down
+            self.close_connection(request)
+
+    def _process_request(self, request, client_address, head, rest):
+        keep_alive = False
+        try:
+            handler = self.RequestHandlerClass(BufferedRequest(request, head), client_address, self)
+            keep_alive = not handler.close_connection
+        except Exception:
+            self.handle_error(request, client_address)
+        if keep_alive:
+            self.idle.park(request, client_address, rest)
+        else:
+            self.close_connection(request)
+
+    def close_connection(self, request):
+        self.shutdown_request(request)
+        self.connection_slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.idle.close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def read_request_head(reader):
+    """Read a request line and headers; return (method, target, version, headers) or None at EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    words = request_line.decode("latin-1").split()
+    if len(words) != 3 or not words[2].startswith("HTTP/"):
+        raise ValueError("Bad request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise ValueError("Too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    target = words[1]
+    if target.startswith("//"):
+        # As BaseHTTPRequestHandler.parse_request does: "//host/dir" would otherwise come back in a
+        # directory redirect as a protocol-relative Location, i.e. an open redirect to another host
+        target = "/" + target.lstrip("/")
+    return words[0], target, words[2], headers
+
+
+def wants_keep_alive(method, version, headers):
+    if method not in ("GET", "HEAD") or headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+        return False  # Request bodies are not read, so the connection cannot be reused
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.1":
+        return connection != "close"
+    return connection == "keep-alive"
+
+
+async def write_response(writer, response, method, keep_alive):
+    status = HTTPStatus(response.status)
+    head = [f"HTTP/1.1 {status.value} {status.phrase}",
+            "Server: simple_server",
+            f"Date: {email.utils.formatdate(usegmt=True)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head += [f"{name}: {value}" for name, value in response.headers]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    if method != "HEAD":
+        if response.file:
+            await writer.drain()
+            # Zero-copy where the platform allows it, chunked reads otherwise
+            await asyncio.get_running_loop().sendfile(writer.transport, response.file,
+                                                      response.offset, response.length)
+        elif response.body:
+            writer.write(response.body)
+    await writer.drain()
+
+
+async def handle_connection(reader, writer, directory):
+    """Serve requests on one connection until the client closes it, asks to, or idles out."""
+    client = (writer.get_extra_info("peername") or ("-",))[0]
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(read_request_head(reader), KEEPALIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            except (ValueError, asyncio.LimitOverrunError):
+                await write_response(writer, error_response(HTTPStatus.BAD_REQUEST), "GET", False)
+                break
+            if request is None:
+                break
+            started = time.perf_counter()
+            method, target, version, headers = request
+            keep_alive = wants_keep_alive(method, version, headers)
+            # stat/open/read and on-the-fly compression block, so they run on the default executor
+            response = await asyncio.get_running_loop().run_in_executor(None, respond, directory, method, target,
+                                                                         headers)
+            sent = 0
+            try:
+                await write_response(writer, response, method, keep_alive)
+                sent = response.length if method != "HEAD" else 0
+            finally:
+                response.close()
+                record_request(client, f"{method} {target} {version}", target, response.status, sent, started)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_async(directory, host, port):
+    server = await asyncio.start_server(partial(handle_connection, directory=directory), host, port,
+                                        limit=MAX_LINE_BYTES, backlog=LISTEN_BACKLOG, reuse_address=True)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(mode="threaded", directory=DIRECTORY, host="0.0.0.0", port=PORT, workers=WORKERS):
+    """Serve directory on host:port with one of SERVING_MODES until interrupted."""
+    print(f"Serving HTML files from {directory} on http://{host}:{port} ({mode} mode)", flush=True)
+    try:
+        if mode == "async":
+            asyncio.run(serve_async(directory, host, port))
+            return
+        if mode == "single":
+            # HTTPServer is the original TCPServer plus address reuse: still one connection at a time
+            server = http.server.HTTPServer((host, port), partial(SingleConnectionRequestHandler, directory=directory))
+        else:
+            server = PooledHTTPServer((host, port), partial(CustomHTTPRequestHandler, directory=directory), workers)
+        with server as httpd:
+            httpd.serve_forever()
+    finally:
+        # The writer is a daemon thread: without this, lines still queued at shutdown are lost
+        access_log.close()
 
 
 if __name__ == "__main__":
-    # Start the server
-    with socketserver.TCPServer(("0.0.0.0", PORT), CustomHTTPRequestHandler) as httpd:
-        print(f"Serving HTML files from {DIRECTORY} on http://0.0.0.0:{PORT}")
-        httpd.serve_forever()
+    parser = argparse.ArgumentParser(description="Serve a folder of static files over HTTP.")
+    parser.add_argument("--mode", choices=SERVING_MODES, default="threaded", help="Serving mode")
+    parser.add_argument("--directory", default=DIRECTORY, help="Folder to serve")
+    parser.add_argument("--bind", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Worker threads of the threaded mode")
+    parser.add_argument("--cache-mb", type=float, default=CACHE_MAX_BYTES / 2 ** 20,
+                        help="Memory for cached file contents (0 disables the cache)")
+    parser.add_argument("--access-log", default="-", metavar="PATH",
+                        help="Access log file ('-' for stderr, '' to disable)")
+    parser.add_argument("--precompress", action="store_true",
+                        help="Write .gz (and .br) siblings for the compressible files in --directory and exit")
+    parser.add_argument("--jobs", type=int, default=None, help="Processes used by --precompress")
+    parser.add_argument("--cache-control", action="append", default=[], metavar="EXT=VALUE",
+                        help="Cache-Control for an extension, e.g. '.js=public, max-age=600' (repeatable)")
+    args = parser.parse_args()
+    for option in args.cache_control:
+        extension, _, value = option.partition("=")
+        CACHE_CONTROL["." + extension.strip().lstrip(".").lower()] = value.strip()
+    file_cache.max_bytes = int(args.cache_mb * 2 ** 20)
+    file_cache.max_file_bytes = min(file_cache.max_file_bytes, file_cache.max_bytes)
+    if args.precompress:
+        precompress_tree(args.directory, args.jobs)
+        sys.exit(0)
+    if args.access_log == "-":
+        access_log.open(sys.stderr)
+    elif args.access_log:
+        access_log.open(open(args.access_log, "a", encoding="utf-8"))
+    # Stop on SIGTERM as on Ctrl-C, so the COMPRESSED_DIR temporary directory is removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        serve(args.mode, args.directory, args.bind, args.port, args.workers)
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -4,16 +4,311 @@ Purpose: To store all the configurations for the application.
 """
 
 import os
-from typing import Any, Generator, Mapping
+import threading
+from typing import Any, Callable, Generator, Iterable, Mapping
+
+# Marks "no value" in layers and in the resolution memo (None and "" are real values)
+_MISSING = object()
+
+
+def _item_hash(key: str, value: Any) -> int:
+    try:
+        return hash((key, value))
+    except TypeError:
+        # Lists and dicts from JSON/YAML files
+        return hash((key, repr(value)))
+
+
+def parse_dotenv(text: str) -> dict[str, str]:
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, _, value = line.partition("=")
+        values[key.strip()] = value.strip()
+    return values
+
+
+def parse_json(text: str) -> dict[str, Any]:
+    import json
+    return json.loads(text) or {}
+
+
+def parse_yaml(text: str) -> dict[str, Any]:
+    import yaml
+    return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+
+
+class Layer:
+    """
+    One source of configuration values. `reload` re-reads the source and
+    returns the keys whose values changed, so a Configuration only has to
+    forget those.
+    """
+
+    def __init__(self, name: str, values: Mapping[str, Any] | None = None):
+        self.name = name
+        self.values: dict[str, Any] = dict(values or {})
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    def get(self, key: str) -> Any:
+        return self.values.get(key, _MISSING)
+
+    def keys(self) -> Iterable[str]:
+        return self.values.keys()
+
+    def assign(self, key: str, value: Any) -> None:
+        self.values[key] = value
+
+    def remove(self, key: str) -> None:
+        self.values.pop(key, None)
+
+    def reload(self) -> set[str]:
+        return set()
+
+
+class EnvLayer(Layer):
+    """
+    The process environment. Only the keys that were looked up (or, with
+    include_all, every variable) are remembered for change detection.
+    """
+
+    def __init__(self, include_all: bool = False):
+        super().__init__("env")
+        self.include_all = include_all
+        # Values set through a Configuration that os.environ cannot hold (not str)
+        self.assigned: dict[str, Any] = {}
+        self.seen: dict[str, Any] = {}
+
+    def get(self, key: str) -> Any:
+        value = os.environ.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.assigned.get(key, _MISSING)
+        self.seen[key] = value
+        return value
+
+    def keys(self) -> Iterable[str]:
+        if self.include_all:
+            return list(os.environ.keys()) + [key for key in self.assigned if key not in os.environ]
+        return self.assigned.keys()
+
+    def assign(self, key: str, value: Any) -> None:
+        try:
+            os.environ[key] = value
+        except TypeError as e:
+            os.environ.pop(key, None)
+            print(
+                "Encountered an error while setting the environment variable.",
+                e
+            )
+        self.assigned[key] = value
+
+    def remove(self, key: str) -> None:
+        os.environ.pop(key, None)
+        self.assigned.pop(key, None)
+
+    def reload(self) -> set[str]:
+        changed = set()
+        for key, value in self.seen.items():
+            current = os.environ.get(key, self.assigned.get(key, _MISSING))
+            if current != value:
+                changed.add(key)
+        if self.include_all:
+            changed.update(key for key in os.environ.keys() if key not in self.seen)
+        for key in changed:
+            self.seen.pop(key, None)
+        return changed
+
+
+class FileLayer(Layer):
+    """
+    A .env, JSON or YAML file. It is parsed on first use and re-parsed by
+    `reload` only when its size or modification time changed.
+    """
+
+    PARSERS: dict[str, Callable[[str], Mapping[str, Any]]] = {
+        ".json": parse_json,
+        ".yaml": parse_yaml,
+        ".yml": parse_yaml,
+    }
+
+    def __init__(self, file_path: str, parser: Callable[[str], Mapping[str, Any]] | None = None):
+        super().__init__(os.path.basename(file_path))
+        self.file_path = file_path
+        self.parser = parser or self.PARSERS.get(os.path.splitext(file_path)[1].lower(), parse_dotenv)
+        self.signature: tuple[int, int] | None = None
+        self.loaded = False
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            stat = os.stat(self.file_path)
+            with open(self.file_path, "r") as file:
+                values = dict(self.parser(file.read()))
+        except FileNotFoundError:
+            self.signature = None
+            return {}
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        return values
+
+    def _load(self) -> None:
+        if not self.loaded:
+            self.values = self._read()
+            self.loaded = True
+
+    def get(self, key: str) -> Any:
+        self._load()
+        return self.values.get(key, _MISSING)
+
+    def keys(self) -> Iterable[str]:
+        self._load()
+        return self.values.keys()
+
+    def assign(self, key: str, value: Any) -> None:
+        self._load()
+        self.values[key] = value
+
+    def remove(self, key: str) -> None:
+        self._load()
+        self.values.pop(key, None)
+
+    def reload(self) -> set[str]:
+        if not self.loaded:
+            return set()
+        try:
+            stat = os.stat(self.file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self.signature and signature is not None:
+            return set()
+        old, self.values = self.values, self._read()
+        return {
+            key for key in old.keys() | self.values.keys()
+            if old.get(key, _MISSING) != self.values.get(key, _MISSING)
+        }
 
 
 class Configuration:
-    def __init__(self):
-        pass
+    """
+    Layered configuration: the first layer that has a key wins, by default
+    overrides > env > .env file > JSON/YAML files > defaults. Attribute
+    assignment and `update` write to the overrides layer; item assignment
+    sets the environment variable, as it always has.
+
+    Keys are resolved on first access and memoized in a plain dict, so repeat
+    reads cost one dict lookup. The memo may hold keys no layer enumerates
+    (e.g. environment variables that were only read); `snapshot()` is the
+    separate dict of the enumerated keys, handed out itself for hot paths,
+    and is what len, iteration, equality, hashing and saving see. `reload()`
+    asks every layer what changed and re-resolves only those keys. The hash
+    is an XOR of per-item hashes of the snapshot, kept up to date as items
+    are replaced and dropped.
+    """
+
+    def __init__(self, layers: list[Layer] | None = None):
+        self._overrides = Layer("overrides")
+        self._layers: list[Layer] = [self._overrides] + (layers if layers is not None else [EnvLayer()])
+        self._resolved: dict[str, Any] = {}
+        self._absent: set[str] = set()
+        # The enumerated keys and their values, once snapshot() has built it
+        self._items: dict[str, Any] | None = None
+        self._hash = 0
+        # Reads of memoized keys take no lock; resolving, invalidating and the hash do
+        self._lock = threading.RLock()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith("_") or hasattr(type(self), name):
+            object.__setattr__(self, name, value)
+            return
+        self._overrides.assign(name, value)
+        self.invalidate((name,))
+
+    def _store(self, key: str, value: Any) -> None:
+        old = self._items.get(key, _MISSING)
+        if old is not _MISSING:
+            self._hash ^= _item_hash(key, old)
+        self._items[key] = value
+        self._hash ^= _item_hash(key, value)
+
+    def _drop(self, key: str) -> None:
+        old = self._items.pop(key, _MISSING)
+        if old is not _MISSING:
+            self._hash ^= _item_hash(key, old)
+
+    def _resolve(self, key: str) -> Any:
+        with self._lock:
+            for layer in self._layers:
+                value = layer.get(key)
+                if value is not _MISSING:
+                    self._absent.discard(key)
+                    self._resolved[key] = value
+                    return value
+            self._resolved.pop(key, None)
+            self._absent.add(key)
+            return _MISSING
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            enumerated = set(self.keys()) if self._items is not None else set()
+            for key in keys:
+                if key in self._resolved or self._items is not None:
+                    # Memoized (or part of the snapshot): re-resolve now so the snapshot stays current
+                    value = self._resolve(key)
+                    if self._items is None:
+                        continue
+                    if value is not _MISSING and key in enumerated:
+                        self._store(key, value)
+                    else:
+                        self._drop(key)
+                else:
+                    self._absent.discard(key)
+
+    def reload(self) -> set[str]:
+        changed = set()
+        for layer in self._layers:
+            changed |= layer.reload()
+        self.invalidate(changed)
+        return changed
+
+    def keys(self) -> list[str]:
+        keys: dict[str, None] = {}
+        for layer in reversed(self._layers):
+            keys.update(dict.fromkeys(layer.keys()))
+        return list(keys)
+
+    def snapshot(self) -> dict[str, Any]:
+        # Live dict of every enumerated key; reload() and assignments keep it up to date
+        with self._lock:
+            if self._items is None:
+                self._items = {}
+                for key in self.keys():
+                    value = self._resolved.get(key, _MISSING)
+                    if value is _MISSING and key not in self._absent:
+                        value = self._resolve(key)
+                    if value is not _MISSING:
+                        self._store(key, value)
+            return self._items
+
+    @property
+    def layers(self) -> list[Layer]:
+        return list(self._layers)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = self._resolved.get(name, _MISSING)
+        if value is _MISSING and name not in self._absent:
+            value = self._resolve(name)
+        if value is _MISSING:
+            raise AttributeError(name)
+        return value
 
     def __repr__(self) -> str:
         items = []
-        for key, value in self.__dict__.items():
+        for key, value in self.to_dict().items():
             key = "".join(_ for _ in key.split("_")).upper()
             items.append(f"{key}={value}")
         out_s = "\n```toml\n"
@@ -23,52 +318,39 @@ class Configuration:
     def __str__(self) -> str:
         return self.__repr__()
 
-    def __getitem__(self, key: str) -> str:
+    def __getitem__(self, key: str) -> Any:
         try:
-            return os.environ[key]
+            return self._resolved[key]
         except KeyError:
-            return self.__dict__.get(key, "")
+            value = _MISSING if key in self._absent else self._resolve(key)
+            return "" if value is _MISSING else value
 
-    def __setitem__(self, key: str, value: str) -> None:
-        try:
-            os.environ[key] = value
-        except KeyError:
-            pass
-        except Exception as e:
-            print(
-                "Encountered an error while setting the environment variable.",
-                e
-            )
-        finally:
-            self.__dict__[key] = value
+    def __setitem__(self, key: str, value: Any) -> None:
+        # The environment when there is one (else the overrides); the newest assignment wins
+        layer = next((layer for layer in self._layers if isinstance(layer, EnvLayer)), self._overrides)
+        if layer is not self._overrides:
+            self._overrides.remove(key)
+        layer.assign(key, value)
+        self.invalidate((key,))
 
     def __delitem__(self, key: str) -> None:
-        try:
-            del os.environ[key]
-        except KeyError:
-            pass
-        except Exception as e:
-            print(
-                "Encountered an error while deleting \
-                    the environment variable.",
-                e
-            )
-        finally:
-            del self.__dict__[key]
+        self[key]
+        if key not in self._resolved:
+            raise KeyError(key)
+        for layer in self._layers:
+            layer.remove(key)
+        self.invalidate((key,))
 
     def __contains__(self, key: str) -> bool:
-        try:
-            return True if os.environ[key] else False
-        except KeyError:
-            return True if self.__dict__.get(key) else False
+        return True if self[key] else False
 
     def __iter__(self) -> Generator[tuple[str, Any], None, None]:
-        _items = self.__dict__.items()
+        _items = self.to_dict().items()
         for item in _items:
             yield item
 
     def __len__(self) -> int:
-        return len(self.__dict__)
+        return len(self.snapshot())
 
     def __bool__(self) -> NotImplementedError:
         return NotImplementedError("This method is not implemented.")
@@ -78,55 +360,55 @@ class Configuration:
             return False
         if not self.__hash__() == other.__hash__():
             return False
-        for key, value in self.__dict__.items():
-            if not other.__dict__.get(key) == value:
-                return False
-        return True
+        return self.snapshot() == other.snapshot()
 
     def __hash__(self) -> int:
-        return hash(tuple(self.__dict__.items()))
+        self.snapshot()
+        return self._hash
+
+    @classmethod
+    def layered(
+        cls,
+        env_file: str | None = None,
+        files: Iterable[str] = (),
+        defaults: Mapping[str, Any] | None = None,
+        include_env: bool = False
+    ) -> "Configuration":
+        # Later files override earlier ones, like successive updates would
+        layers: list[Layer] = [EnvLayer(include_all=include_env)]
+        if env_file:
+            layers.append(FileLayer(env_file, parse_dotenv))
+        layers.extend(FileLayer(file_path) for file_path in reversed(list(files)))
+        if defaults:
+            layers.append(Layer("defaults", defaults))
+        return cls(layers)
 
     @classmethod
     def initialize(cls, file_path: str | None = None) -> "Configuration":
         if not file_path:
             file_path = os.path.join(os.path.dirname(
                 os.path.dirname(__file__)), ".env")
-        _instance = cls()
-        try:
-            with open(file_path, "r") as file:
-                for line in file:
-                    key, value = line.strip().split("=")
-                    _instance.__setattr__(key, value)
-        except FileNotFoundError:
+        if not os.path.exists(file_path):
             raise FileNotFoundError(
                 "The configuration file is not found.", file_path)
-        except Exception as e:
-            print("Encountered an error while initializing \
-                  the configuration.", e)
-        return _instance
+        return cls.layered(env_file=file_path)
 
     @classmethod
     def initialize_from_mapping(
-        cls, config: Mapping[str, str]
+        cls, config: Mapping[str, Any]
     ) -> "Configuration":
-        _instance = cls()
-        for key, value in config.items():
-            _instance.__setattr__(key, value)
-        return _instance
+        return cls([EnvLayer(), Layer("mapping", config)])
 
     @classmethod
     def initialize_from_env(cls) -> "Configuration":
-        _instance = cls()
-        for key, value in os.environ.items():
-            _instance.__setattr__(key, value)
-        return _instance
+        return cls([EnvLayer(include_all=True)])
 
     def save(self, file_path: str | None = None) -> None:
         if not file_path:
             file_path = os.path.join(__file__, ".env")
         try:
             with open(file_path, "w") as file:
-                for key, value in self.__dict__.items():
+                for key, value in self.to_dict().items():
                     file.write(f"{key}={value}\n")
         except Exception as e:
             print("Encountered an error while saving the configuration.", e)
@@ -144,31 +426,22 @@ class Configuration:
         if json_data and file_path:
             raise ValueError(
                 "Both the JSON data and the file path cannot be provided.")
-        if json_data and not file_path:
+        if json_data:
             try:
-                import json
-                config = json.loads(json_data)
+                config = parse_json(json_data)
             except Exception as e:
                 print("Encountered an error while loading the JSON data.", e)
-        if not json_data and file_path:
-            try:
-                import json
-                with open(file_path, "r") as file:
-                    config = json.load(file)
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                    "The configuration file is not found.", file_path)
-            except Exception as e:
-                print(
-                    "Encountered an error while loading the configuration.",
-                    e
-                )
-        return cls.initialize_from_mapping(config)
+                config = {}
+            return cls.initialize_from_mapping(config)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(
+                "The configuration file is not found.", file_path)
+        return cls([EnvLayer(), FileLayer(file_path, parse_json)])
 
     def to_json(self, file_path: str | None = None) -> str | None:
         try:
             import json
-            config = {key: value for key, value in self.__dict__.items()}
+            config = self.to_dict()
             if not file_path:
                 return json.dumps(config)
             with open(file_path, "w") as file:
@@ -178,29 +451,32 @@ class Configuration:
         return None
 
     def to_dict(self) -> dict[str, Any]:
-        return {key: value for key, value in self.__dict__.items()}
+        return dict(self.snapshot())
 
     def to_mapping(self) -> Mapping[str, Any]:
-        return {key: value for key, value in self.__dict__.items()}
+        return dict(self.snapshot())
 
     def to_env(self) -> None:
-        for key, value in self.__dict__.items():
+        for key, value in self.to_dict().items():
             os.environ[key] = value
         return None
 
     def clear(self) -> None:
-        for key in self.__dict__.keys():
+        for key in self.keys():
             self.__delitem__(key)
         return None
 
     def copy(self) -> "Configuration":
         return self.initialize_from_mapping(self.to_mapping())
 
-    def update(self, config: Mapping[str, str]) -> None:
+    def update(self, config: Mapping[str, Any]) -> None:
+        # Into the overrides layer, like attribute assignment; os.environ is left alone
         for key, value in config.items():
-            self.__setattr__(key, value)
+            self._overrides.assign(key, value)
+        self.invalidate(config.keys())
         return None
 
+    @classmethod
     def from_yaml(
         cls,
             yaml_data: str | None = None,
@@ -212,31 +488,22 @@ class Configuration:
         if yaml_data and file_path:
             raise ValueError(
                 "Both the YAML data and the file path cannot be provided.")
-        if yaml_data and not file_path:
+        if yaml_data:
             try:
-                import yaml
-                config = yaml.safe_load(yaml_data)
+                config = parse_yaml(yaml_data)
             except Exception as e:
                 print("Encountered an error while loading the YAML data.", e)
-        if not yaml_data and file_path:
-            try:
-                import yaml
-                with open(file_path, "r") as file:
-                    config = yaml.safe_load(file)
-            except FileNotFoundError:
-                raise FileNotFoundError(
-                    "The configuration file is not found.", file_path)
-            except Exception as e:
-                print(
-                    "Encountered an error while loading the configuration.",
-                    e
-                )
-        return cls.initialize_from_mapping(config)
+                config = {}
+            return cls.initialize_from_mapping(config)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(
+                "The configuration file is not found.", file_path)
+        return cls([EnvLayer(), FileLayer(file_path, parse_yaml)])
 
     def to_yaml(self, file_path: str | None = None) -> str | None:
         try:
             import yaml
-            config = {key: value for key, value in self.__dict__.items()}
+            config = self.to_dict()
 
             # Format the config keys for yaml output
             config = {key.replace("_", " "): value for key,